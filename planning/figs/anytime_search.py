@@ -0,0 +1,211 @@
+""" Anytime Repairing A* (ARA*).
+
+ARA* first runs weighted A*, with priorities g + w * h for some w > 1.
+This finds a path quickly, and the path costs at most w times the
+optimal cost.  The weight is then lowered step by step.  Each new
+search reuses the g-values of the previous one and only re-expands the
+states whose values became inconsistent, so every improved path is
+much cheaper to find than with a search from scratch.
+
+After each search the suboptimality bound is tightened to
+
+    min(w, g(goal) / min over OPEN and INCONS of (g + h))
+
+which is often far below w.  The search stops when the bound reaches 1
+(the path is optimal), or when the time limit or expansion budget runs
+out, returning the best path found so far.
+
+Reference: Likhachev, Gordon and Thrun, "ARA*: Anytime A* with
+Provable Bounds on Sub-Optimality", NIPS 2003.
+"""
+import time
+
+import book_search
+
+INF = float('inf')
+
+
+class ARAStar(object):
+    """Anytime search for a problem with a consistent heuristic.
+
+    After search returns:
+      path       - best path found (None if none was found in time)
+      path_cost  - its cost
+      bound      - path_cost is at most bound times the optimal cost (1
+                   once the search finishes with a path)
+      finished   - False if the time limit or expansion budget ran out
+                   before the path was shown to be optimal
+      solutions  - (expansions, seconds, cost, bound) for every improved
+                   path, in the order they were found
+      expansions - states expanded by all of the searches
+
+    Collection is the class of OPEN.  It needs add (which keeps the
+    lower priority of a state added twice), pop, top_priority, is_empty
+    and iteration over its states.
+    """
+
+    def __init__(self, problem, initial_weight=3.0, weight_step=.5,
+                 stats=None, Collection=book_search.IndexedPriorityQueue):
+        self.problem = problem
+        self.initial_weight = initial_weight
+        self.weight_step = weight_step
+        self.stats = stats
+        self.Collection = Collection
+
+    def _key(self, state):
+        return (self.g[state] +
+                self.weight * self.problem.heuristic(state))
+
+    def _out_of_budget(self):
+        if (self.max_expansions is not None and
+                self.expansions >= self.max_expansions):
+            return True
+        return (self.deadline is not None and
+                time.perf_counter() >= self.deadline)
+
+    def _improve_path(self):
+        """ Weighted A* that only expands inconsistent states. """
+        problem = self.problem
+        goal = problem.goal()
+        g = self.g
+        while (not self.open.is_empty() and
+               self.g.get(goal, INF) > self.open.top_priority()):
+            if self._out_of_budget():
+                return False
+            state = self.open.pop()
+            self.closed.add(state)
+            self.expansions += 1
+            for next_state in problem.successors(state):
+                value = g[state] + problem.cost(state, next_state)
+                if value < g.get(next_state, INF):
+                    g[next_state] = value
+                    self.parents[next_state] = state
+                    if next_state in self.closed:
+                        self.incons.add(next_state)
+                    else:
+                        self.open.add(next_state, self._key(next_state))
+        return True
+
+    def _bound(self, complete=True):
+        """Suboptimality bound of the current path to the goal.  Some state
+        on an optimal path is always in OPEN or INCONS with its optimal g,
+        so the smallest g + h there is a lower bound on the optimal cost.
+        The weight is a bound too, but only once _improve_path completes.
+
+        """
+        heuristic = self.problem.heuristic
+        lowest = min([self.g[state] + heuristic(state)
+                      for state in list(self.open) + list(self.incons)] +
+                     [INF])
+        cost = self.g.get(self.problem.goal(), INF)
+        if lowest >= cost:
+            return 1.0
+        if not complete:
+            return cost / lowest
+        return min(self.weight, cost / lowest)
+
+    def _path(self):
+        state = self.problem.goal()
+        path = [state]
+        while state != self.problem.start():
+            state = self.parents[state]
+            path.append(state)
+        path.reverse()
+        return path
+
+    def improved_paths(self, time_limit=None, max_expansions=None):
+        """Generator of (path, cost, bound) for every improved path.  Stops
+        once the path is optimal, or when time_limit (seconds) or
+        max_expansions run out.  Later searches can tighten the bound
+        without improving the path, so self.bound holds the latest one.
+
+        """
+        problem = self.problem
+        start_time = time.perf_counter()
+        self.deadline = (None if time_limit is None
+                         else start_time + time_limit)
+        self.max_expansions = max_expansions
+        self.expansions = 0
+        self.weight = self.initial_weight
+        self.finished = False
+        self.bound = INF
+        self.solutions = []
+        self.g = {problem.start(): 0.0}
+        self.parents = {}
+        self.open = self.Collection()
+        self.closed = set()
+        self.incons = set()
+        if self.stats is not None:
+            self.problem, self.open = self.stats.instrument(
+                problem, self.open, self.closed)
+        self.open.add(problem.start(), self._key(problem.start()))
+
+        goal = problem.goal()
+        cost = INF
+        try:
+            while True:
+                in_budget = self._improve_path()
+                if self.g.get(goal, INF) < cost:
+                    cost = self.g[goal]
+                    self.bound = self._bound(in_budget)
+                    self.solutions.append(
+                        (self.expansions, time.perf_counter() - start_time,
+                         cost, self.bound))
+                    yield self._path(), cost, self.bound
+                elif cost < INF:
+                    # The path is the same, but a lower weight or a
+                    # smaller OPEN can still tighten its bound.
+                    self.bound = min(self.bound, self._bound(in_budget))
+                if not in_budget:
+                    return
+                if cost == INF or self.weight == 1.0 or self._bound() <= 1.0:
+                    self.finished = True
+                    if cost < INF:
+                        self.bound = 1.0
+                    return
+
+                # Lower the weight and search again from the states whose
+                # values changed after they were expanded.  Lowering the
+                # weight only lowers keys, so add can re-key OPEN.
+                self.weight = max(1.0, self.weight - self.weight_step)
+                for state in list(self.open) + list(self.incons):
+                    self.open.add(state, self._key(state))
+                if self.stats is not None:
+                    self.stats.reopened += len(self.incons)
+                self.incons = set()
+                self.closed.clear()
+        finally:
+            if self.stats is not None:
+                self.stats.finish(None if cost == INF else cost)
+            self.problem = problem
+
+    def search(self, time_limit=None, max_expansions=None):
+        """ Run until done or out of budget and return the best path. """
+        self.path = None
+        self.path_cost = INF
+        for path, cost, _ in self.improved_paths(time_limit,
+                                                 max_expansions):
+            self.path, self.path_cost = path, cost
+        return self.path
+
+
+def ara_star_search(problem, time_limit=None, max_expansions=None,
+                    initial_weight=3.0, weight_step=.5, stats=None):
+    """ Best path ARA* finds within the time limit and expansion budget. """
+    return ARAStar(problem, initial_weight, weight_step, stats).search(
+        time_limit, max_expansions)
+
+
+def main():
+    p = book_search.load_grid_problem('filled_grid_cells.dat')
+    planner = ARAStar(p, initial_weight=5.0)
+    planner.search()
+    print("{:>10} {:>9} {:>9} {:>7}".format("expansions", "seconds", "cost",
+                                            "bound"))
+    for expansions, seconds, cost, bound in planner.solutions:
+        print("{:>10} {:>9.4f} {:>9.3f} {:>7.3f}".format(expansions, seconds,
+                                                         cost, bound))
+
+
+if __name__ == "__main__":
+    main()
@@ -77,15 +77,18 @@ class ArmProblem(Problem):
         
         return steps
         
+    def config_ok(self, q):
+        """ True if q is within the joint limits and collision free. """
+        if not self.arm.set_angles(q):
+            return False
+        if self.arm.self_collision():
+            return False
+        return not self.arm.check_collision(self.obstacles)
+
     def step_ok(self, q1, q2):
         steps = self.angle_sequence(q1, q2)
         for step in range(steps.shape[0]-1, -1, -1):
-            q = steps[step]
-            if not self.arm.set_angles(q):
-                return False
-            if self.arm.self_collision():
-                return False
-            if self.arm.check_collision(self.obstacles):
+            if not self.config_ok(steps[step]):
                 return False
         return True
             
@@ -1,7 +1,9 @@
 import unittest
+from unittest import mock
 import shapely
 import shapely.geometry
 from arm import Arm
+import grid_planner
 
 class TestArm(unittest.TestCase):
 
@@ -38,6 +40,233 @@ class TestArm(unittest.TestCase):
         self.assertFalse(self.arm.check_collision(obstacles))
 
 
+class TestGridPlanner(unittest.TestCase):
+
+    def setUp(self):
+        arm_problem = grid_planner.ArmProblemArm(
+            [0., 0.], [40., -30.],
+            obstacles=[shapely.geometry.Point(60, 50).buffer(10)])
+        self.problem = grid_planner.ArmProblem(arm_problem)
+
+    def path_cost(self, path):
+        return sum(self.problem.cost(path[i], path[i + 1])
+                   for i in range(len(path) - 1))
+
+    def test_search_stats(self):
+        counts = {'expansions': 0, 'generated': 0, 'pushes': 0, 'pops': 0}
+        successors = self.problem.successors
+
+        def counted_successors(state):
+            next_states = successors(state)
+            counts['expansions'] += 1
+            counts['generated'] += len(next_states)
+            return next_states
+
+        class CountedQueue(grid_planner.PriorityQueue):
+            def add(self, item, priority):
+                counts['pushes'] += 1
+                super(CountedQueue, self).add(item, priority)
+
+            def pop(self):
+                counts['pops'] += 1
+                return super(CountedQueue, self).pop()
+
+        self.problem.successors = counted_successors
+        stats = grid_planner.SearchStats()
+        with mock.patch.object(grid_planner, 'PriorityQueue', CountedQueue):
+            path = grid_planner.astar_search(self.problem, stats).path
+        self.assertEqual(stats.expansions, counts['expansions'])
+        self.assertEqual(stats.generated, counts['generated'])
+        # Every pop closes a state, and the goal is popped unexpanded.
+        self.assertEqual(counts['pops'], counts['expansions'] + 1)
+        self.assertEqual(stats.peak_closed, counts['pops'])
+        self.assertGreater(stats.peak_frontier, 0)
+        self.assertLessEqual(stats.peak_frontier, counts['pushes'])
+        self.assertAlmostEqual(stats.path_cost, self.path_cost(path))
+        self.assertGreater(stats.queue_time, 0.0)
+        self.assertGreaterEqual(stats.total_time, stats.successors_time)
+
+    def test_lattice_states(self):
+        problem = grid_planner.ArmProblem(
+            grid_planner.ArmProblemArm([180., -30.], [20., 45.]))
+        start = problem.start()
+        self.assertEqual(problem.lattice_index(start), (36, 66))
+        self.assertEqual(problem.state_id([-540. + 1e-9, 330.]), start)
+        goal = problem.goal()
+        self.assertEqual(problem.state_id(problem.angles(goal)), goal)
+        self.assertEqual(list(problem.angles(goal)), [20., 45.])
+
+        # Turning the first joint past 180 degrees wraps around.
+        angles = sorted(tuple(problem.angles(state))
+                        for state in problem.successors(start))
+        self.assertEqual(angles, [(-180., -35.), (-180., -25.),
+                                  (-175., -30.), (175., -30.)])
+
+    def test_validity_cache(self):
+        cache = grid_planner.ValidityCache()
+        arm_problem = self.problem.arm_problem
+        cached = grid_planner.ArmProblem(arm_problem, cache)
+        expected = grid_planner.astar_search(self.problem).path
+        self.assertEqual(grid_planner.astar_search(cached).path, expected)
+        misses = cache.vertex_misses
+        self.assertGreater(cache.vertex_hits, 0)
+        self.assertEqual(misses, len(cache.vertices))
+
+        # A second query on the same obstacles reuses the results.
+        reverse = grid_planner.ArmProblem(grid_planner.ArmProblemArm(
+            arm_problem.goal(), arm_problem.start(),
+            obstacles=arm_problem.obstacles), cache)
+        self.assertEqual(reverse.start(), cached.goal())
+        path = grid_planner.astar_search(reverse).path
+        self.assertAlmostEqual(self.path_cost(path),
+                               self.path_cost(expected))
+        self.assertLess(cache.vertex_misses - misses, misses)
+
+        small = grid_planner.ValidityCache(max_entries=10)
+        grid_planner.astar_search(grid_planner.ArmProblem(arm_problem,
+                                                          small))
+        self.assertEqual(len(small.vertices), 10)
+        self.assertRaises(ValueError, grid_planner.ArmProblem,
+                          grid_planner.ArmProblemArm([0., 0.], [40., -30.]),
+                          small)
+
+    def test_lazy_astar(self):
+        eager = grid_planner.ArmProblem(self.problem.arm_problem)
+        expected = self.path_cost(grid_planner.astar_search(eager).path)
+        lazy = grid_planner.ArmProblem(self.problem.arm_problem)
+        stats = grid_planner.SearchStats()
+        result = grid_planner.lazy_astar_search(lazy, stats)
+        self.assertEqual(result.status, grid_planner.SUCCESS)
+        path = result.path
+        self.assertEqual(path[0], lazy.start())
+        self.assertEqual(path[-1], lazy.goal())
+        self.assertAlmostEqual(self.path_cost(path), expected)
+        self.assertAlmostEqual(stats.path_cost, expected)
+        for state, next_state in zip(path, path[1:]):
+            self.assertIn(next_state, self.problem.successors(state))
+        self.assertLess(lazy.step_checks, eager.step_checks)
+
+    def test_parallel_validator(self):
+        arm_problem = self.problem.arm_problem
+        expected = grid_planner.astar_search(self.problem).path
+        serial_checks = self.problem.step_checks
+        with grid_planner.ParallelValidator(arm_problem, 2) as validator:
+            for batch in [1, 4]:
+                parallel = grid_planner.ArmProblem(arm_problem,
+                                                   validator=validator)
+                path = grid_planner.astar_search(parallel, batch=batch).path
+                self.assertEqual(path, expected)
+                self.assertEqual(parallel.step_checks, serial_checks)
+                # Only the results for the latest batch are kept.
+                self.assertLessEqual(len(parallel._prefetched),
+                                     batch * 2 * parallel.num_joints)
+
+            # Configurations shared by several steps are checked once:
+            # start and the state two joints away share two neighbors.
+            start = parallel.start()
+            corner = parallel.neighbors(parallel.neighbors(start)[1])[3]
+            checks = validator.config_checks
+            parallel.prefetch([start, corner])
+            self.assertEqual(validator.config_checks - checks, 6)
+
+        # Prefetching leaves the same cache, with the same statistics,
+        # as the serial search, also when edges have configurations of
+        # their own.
+        class CoarseProblem(grid_planner.ArmProblem):
+            STEP = 10.0
+            NUM_STEPS = 36
+
+        for Problem in [grid_planner.ArmProblem, CoarseProblem]:
+            serial_cache = grid_planner.ValidityCache()
+            serial = Problem(arm_problem, serial_cache)
+            expected = grid_planner.astar_search(serial).path
+            with grid_planner.ParallelValidator(arm_problem,
+                                                2) as validator:
+                cache = grid_planner.ValidityCache()
+                parallel = Problem(arm_problem, cache, validator)
+                path = grid_planner.astar_search(parallel, batch=4).path
+                self.assertEqual(path, expected)
+            self.assertEqual(repr(cache), repr(serial_cache))
+            self.assertEqual(list(cache.vertices.items()),
+                             list(serial_cache.vertices.items()))
+            self.assertEqual(list(cache.edges.items()),
+                             list(serial_cache.edges.items()))
+        self.assertGreater(cache.edge_misses, 0)
+        self.assertRaises(ValueError, grid_planner.ArmProblem,
+                          grid_planner.ArmProblemArm([0., 0.], [40., -30.]),
+                          None, validator)
+
+    def test_search_budget(self):
+        result = grid_planner.astar_search(self.problem)
+        expected = result.path
+        self.assertEqual(result.status, grid_planner.SUCCESS)
+        self.assertEqual(result.partial_path, expected)
+        self.assertAlmostEqual(result.path_cost, self.path_cost(expected))
+        result = grid_planner.dijkstra_search(self.problem)
+        self.assertEqual(result.status, grid_planner.SUCCESS)
+        self.assertAlmostEqual(result.path_cost, self.path_cost(expected))
+
+        for search in [grid_planner.astar_search,
+                       grid_planner.dijkstra_search,
+                       grid_planner.lazy_astar_search]:
+            stats = grid_planner.SearchStats()
+            result = search(self.problem, stats, max_expansions=5)
+            self.assertEqual(result.status, grid_planner.EXHAUSTED)
+            self.assertIsNone(result.path)
+            self.assertEqual(result.partial_path[0], self.problem.start())
+            self.assertEqual(result.expansions, 5)
+            self.assertEqual(stats.expansions, 5)
+            self.assertIsNone(stats.path_cost)
+            self.assertLess(
+                self.problem.heuristic(result.partial_path[-1]),
+                self.problem.heuristic(self.problem.start()))
+
+        # A deadline in the past stops the search before any expansion.
+        for search in [grid_planner.astar_search,
+                       grid_planner.lazy_astar_search]:
+            result = search(self.problem, deadline=0.0)
+            self.assertEqual(result.status, grid_planner.TIMEOUT)
+            self.assertEqual(result.partial_path, [self.problem.start()])
+        self.assertIsNone(grid_planner.ara_star_search(self.problem,
+                                                       deadline=0.0))
+
+    def test_ara_star(self):
+        expected = self.path_cost(grid_planner.astar_search(self.problem).path)
+        stats = grid_planner.SearchStats()
+        planner = grid_planner.anytime_search.ARAStar(
+            self.problem, 3.0, stats=stats,
+            Collection=grid_planner.PriorityQueue)
+        solutions = list(planner.improved_paths())
+        self.assertGreater(len(solutions), 0)
+        costs = [cost for _, cost, _ in solutions]
+        bounds = [bound for _, _, bound in solutions] + [planner.bound]
+        self.assertEqual(costs, sorted(costs, reverse=True))
+        self.assertEqual(bounds, sorted(bounds, reverse=True))
+        for path, cost, bound in solutions:
+            self.assertEqual(path[0], self.problem.start())
+            self.assertEqual(path[-1], self.problem.goal())
+            self.assertAlmostEqual(self.path_cost(path), cost)
+            self.assertLessEqual(cost, bound * expected + 1e-9)
+        self.assertTrue(planner.finished)
+        self.assertEqual(planner.bound, 1.0)
+        path = solutions[-1][0]
+        self.assertAlmostEqual(costs[-1], expected)
+        self.assertAlmostEqual(stats.path_cost, expected)
+        self.assertEqual(grid_planner.ara_star_search(self.problem), path)
+
+    def test_ida_star(self):
+        expected = self.path_cost(grid_planner.astar_search(self.problem).path)
+        for max_nodes in [100000, 30]:
+            stats = grid_planner.SearchStats()
+            planner = grid_planner.IDAStar(self.problem, max_nodes, stats)
+            path = planner.search()
+            self.assertEqual(path[0], self.problem.start())
+            self.assertEqual(path[-1], self.problem.goal())
+            self.assertAlmostEqual(self.path_cost(path), expected)
+            self.assertAlmostEqual(stats.path_cost, expected)
+            self.assertLessEqual(planner.table_size, max_nodes)
+            self.assertEqual(stats.peak_closed, planner.table_size)
+
 
 if __name__ == '__main__':
     unittest.main()
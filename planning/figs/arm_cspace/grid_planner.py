@@ -2,12 +2,29 @@ import tempfile
 import shutil
 import subprocess
 import argparse
+import collections
+import multiprocessing
+import time
 import six
 import heapq
 import math
+import os
+import sys
 from arm_planning import ArmProblem as ArmProblemArm
 import numpy as np
 
+# The search statistics and ARA* are shared with the grid searches one
+# directory up.
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                             os.pardir))
+import anytime_search
+from book_search import SearchStats
+
+INF = float('inf')
+
+# Marks heap entries whose item was re-added with a lower priority.
+REMOVED = object()
+
 
 
 class PriorityQueue(object):
@@ -40,7 +57,7 @@ class PriorityQueue(object):
         self.count += 1
         if item in self.entry_finder:
             if priority < self.entry_finder[item][0]:
-                self.entry_finder[item][2] = 'REMOVED'
+                self.entry_finder[item][2] = REMOVED
                 del self.entry_finder[item]
             else:
                 return
@@ -61,11 +78,31 @@ class PriorityQueue(object):
         """
         while len(self) != 0:
             _, _, item = heapq.heappop(self.heap)
-            if item != 'REMOVED':
+            if item is not REMOVED:
                 del self.entry_finder[item]
                 return item
         raise KeyError("Pop from empty priority queue")
 
+    def top(self, k):
+        """ Up to k items in the order pop would return them, without
+        removing them. """
+        items = []
+        candidates = [(self.heap[0], 0)] if self.heap else []
+        while candidates and len(items) < k:
+            entry, index = heapq.heappop(candidates)
+            if entry[2] is not REMOVED:
+                items.append(entry[2])
+            for child in (2 * index + 1, 2 * index + 2):
+                if child < len(self.heap):
+                    heapq.heappush(candidates, (self.heap[child], child))
+        return items
+
+    def top_priority(self):
+        """ Priority of the item that pop would return. """
+        while self.heap[0][2] is REMOVED:
+            heapq.heappop(self.heap)
+        return self.heap[0][0]
+
     def __len__(self):
         """ Return the number of elements stored in the set. """
         return len(self.entry_finder)
@@ -75,7 +112,7 @@ class PriorityQueue(object):
 
     def __iter__(self):
         """ Iteration will loop over items (not keys.) """
-        return [item[1][2] for item in self.entry_finder.iteritems()].__iter__()
+        return [item[1][2] for item in self.entry_finder.items()].__iter__()
 
 
     
@@ -141,25 +178,6 @@ class Problem:
     def cost(self, state, next_state):
         raise NotImplementedError
     
-class ArmState(object):
-    def __init__(self, q):
-        """ cost is cost to enter """
-        self.q = q
-    
-    def __repr__(self):
-        return str(self.q)
-    
-    def __eq__(self, other):
-        return np.allclose(self.q, other.q)
-
-    def __neq__(self, other):
-        return not self == other
-
-    def __hash__(self):
-        return hash(str(self.q))
-
-
-
 def angle_diffs(xs, y):
     #https://stackoverflow.com/questions/1878907/
     #the-smallest-difference-between-2-angles
@@ -174,46 +192,392 @@ def angle_metric_l2(xs, y):
     diffs = angle_diffs(xs, y)
     return  np.sqrt(np.sum(diffs**2))
 
+class ValidityCache(object):
+    """
+    Remembers which lattice states (arm configurations) and lattice edges
+    (the configurations swept between two neighboring states) are
+    collision free, so that ArmProblem.successors does not repeat the
+    shapely tests for a state reached from another neighbor, or in a
+    later query.  Each table keeps at most max_entries results and
+    forgets the least recently used ones first.
+
+    Edges only have configurations of their own when STEP exceeds the
+    arm problem's MAX_ANGLE_DELTA; otherwise a step is valid exactly if
+    the state it leads to is.
+
+    vertex_hits, vertex_misses, edge_hits and edge_misses count lookups.
+    """
+
+    def __init__(self, max_entries=1000000):
+        self.max_entries = max_entries
+        self.vertices = collections.OrderedDict()
+        self.edges = collections.OrderedDict()
+        self.vertex_hits = 0
+        self.vertex_misses = 0
+        self.edge_hits = 0
+        self.edge_misses = 0
+        self.problem = None
+        self._lattice = None
+        self._obstacles = None
+
+    def attach(self, problem):
+        """Use this cache for problem (an ArmProblem).  All problems
+        sharing it must have the same arm, obstacles and lattice.
+
+        """
+        arm_problem = problem.arm_problem
+        lattice = (tuple(problem.origin), problem.STEP,
+                   tuple(arm_problem.arm.lengths))
+        obstacles = list(arm_problem.obstacles)
+        if self._lattice is None:
+            self._lattice = lattice
+            self._obstacles = obstacles
+        elif lattice != self._lattice or obstacles != self._obstacles:
+            raise ValueError("ValidityCache shared by problems with "
+                             "different arms, obstacles or lattices")
+        self.problem = problem
+        self._edge_configurations = (
+            math.ceil(problem.STEP / arm_problem.MAX_ANGLE_DELTA) > 1)
+
+    def _lookup(self, table, key):
+        """ Cached result for key (marking it recently used), or None. """
+        valid = table.get(key)
+        if valid is not None:
+            table.move_to_end(key)
+        return valid
+
+    def _store(self, table, key, valid):
+        table[key] = valid
+        if len(table) > self.max_entries:
+            table.popitem(last=False)
+
+    def vertex_ok(self, state, valid=None):
+        """True if the arm is collision free at state.  valid, if given,
+        is used instead of checking on a miss (see ArmProblem.prefetch).
+
+        """
+        cached = self._lookup(self.vertices, state)
+        if cached is not None:
+            self.vertex_hits += 1
+            return cached
+        self.vertex_misses += 1
+        if valid is None:
+            valid = self.problem.arm_problem.config_ok(
+                self.problem.angles(state))
+        self._store(self.vertices, state, valid)
+        return valid
+
+    def edge_ok(self, state, next_state, valid=None):
+        """True if the configurations strictly between the two states are
+        collision free.  valid is used as in vertex_ok.
+
+        """
+        if not self._edge_configurations:
+            return True
+        key = self._edge_key(state, next_state)
+        cached = self._lookup(self.edges, key)
+        if cached is not None:
+            self.edge_hits += 1
+            return cached
+        self.edge_misses += 1
+        if valid is None:
+            arm_problem = self.problem.arm_problem
+            steps = arm_problem.angle_sequence(
+                self.problem.angles(state), self.problem.angles(next_state))
+            valid = all(arm_problem.config_ok(q) for q in steps[:-1])
+        self._store(self.edges, key, valid)
+        return valid
+
+    def _edge_key(self, state, next_state):
+        return (min(state, next_state), max(state, next_state))
+
+    def step_ok(self, state, next_state, prefetched=None):
+        """Same result as ArmProblem's arm_problem.step_ok.  prefetched
+        is None or a (vertex_valid, edge_valid) pair of results to use on
+        misses, either of which may be None.
+
+        """
+        vertex_valid, edge_valid = prefetched or (None, None)
+        return (self.vertex_ok(next_state, vertex_valid) and
+                self.edge_ok(state, next_state, edge_valid))
+
+    def known_vertex(self, state):
+        """ Cached result for state or None, without counting a lookup or
+        marking it recently used. """
+        return self.vertices.get(state)
+
+    def known_edge(self, state, next_state):
+        """ Same as known_vertex, for the edge between two states. """
+        if not self._edge_configurations:
+            return True
+        return self.edges.get(self._edge_key(state, next_state))
+
+    def hit_rate(self):
+        lookups = (self.vertex_hits + self.vertex_misses + self.edge_hits +
+                   self.edge_misses)
+        if lookups == 0:
+            return 0.0
+        return (self.vertex_hits + self.edge_hits) / float(lookups)
+
+    def __repr__(self):
+        return ("ValidityCache(vertices={}, vertex_hits={}, "
+                "vertex_misses={}, edges={}, edge_hits={}, edge_misses={}, "
+                "hit_rate={:.3f})".format(
+                    len(self.vertices), self.vertex_hits, self.vertex_misses,
+                    len(self.edges), self.edge_hits, self.edge_misses,
+                    self.hit_rate()))
+
+
+# The arm problem of a ParallelValidator worker process.
+_worker_arm_problem = None
+
+
+def _init_validator(arm_problem):
+    global _worker_arm_problem
+    _worker_arm_problem = arm_problem
+
+
+def _check_config(q):
+    """ True if the arm is collision free at the joint angles q. """
+    return _worker_arm_problem.config_ok(q)
+
+
+def _check_edge(angles):
+    """True if the configurations strictly between the joint angles
+    (q1, q2) are collision free, as in ValidityCache.edge_ok.
+
+    """
+    q1, q2 = angles
+    arm_problem = _worker_arm_problem
+    steps = arm_problem.angle_sequence(q1, q2)
+    return all(arm_problem.config_ok(q) for q in steps[:-1])
+
+
+class ParallelValidator(object):
+    """
+    Checks batches of arm configurations and edges on a pool of
+    num_workers processes.  Each worker receives its own copy of
+    arm_problem (the Arm and obstacles) once, when it starts, so a task
+    carries only arrays of joint angles.  Results come back in the order
+    the tasks were given, so an ArmProblem using a validator has the same
+    successors as one without, and searches expand the same states and
+    return the same paths.
+
+    config_checks and edge_checks count the tasks sent to the workers.
+    Shut the workers down with close, or use the validator in a with
+    statement.
+    """
+
+    def __init__(self, arm_problem, num_workers=4):
+        self.arm_problem = arm_problem
+        self.num_workers = num_workers
+        self.config_checks = 0
+        self.edge_checks = 0
+        self.pool = multiprocessing.Pool(num_workers,
+                                         initializer=_init_validator,
+                                         initargs=(arm_problem,))
+
+    def _map(self, function, tasks):
+        if not tasks:
+            return []
+        chunksize = -(-len(tasks) // self.num_workers)
+        return self.pool.map(function, tasks, chunksize)
+
+    def check_configs(self, configs):
+        """ List of collision checks, one per array of joint angles. """
+        self.config_checks += len(configs)
+        return self._map(_check_config, configs)
+
+    def check_edges(self, edges):
+        """ List of checks of the configurations strictly between each
+        (q1, q2) pair of joint angles. """
+        self.edge_checks += len(edges)
+        return self._map(_check_edge, edges)
+
+    def close(self):
+        self.pool.close()
+        self.pool.join()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
 class ArmProblem:
-    def __init__(self, arm_problem):
+    """
+    Search problem on a lattice over the arm's joint angles: each step
+    turns one joint by STEP degrees.  The lattice points are the angles
+    that differ from the start angles by multiples of STEP, and the goal
+    is the lattice state nearest the goal angles.
+
+    States are plain integers that pack one lattice index (0 .. 71) per
+    joint, so they hash and compare exactly and cost no more memory than
+    an int.  Index 0 is the lattice angle in [0, STEP), so problems whose
+    start angles are all multiples of STEP share their states.  Use
+    state_id and angles to convert between states and arrays of joint
+    angles, and lattice_index for the per joint indices.
+
+    cache is an optional ValidityCache, which can be shared by problems
+    with the same arm, obstacles and lattice.  step_checks counts calls
+    to step_ok (including those answered by the cache or prefetched).
+
+    validator is an optional ParallelValidator for the same arm and
+    obstacles.  With one, successors checks all steps out of a state in
+    one batch, and prefetch can check the steps out of several states
+    (for instance the next few on a search frontier) at once.  Only the
+    results for the states of the latest batch are kept, and results
+    reach the cache only when step_ok uses them, so the cache and its
+    statistics end up the same as without prefetching.
+    """
+    STEP = 5.0
+    NUM_STEPS = 72  # 360 / STEP
+
+    def __init__(self, arm_problem, cache=None, validator=None):
         self.arm_problem = arm_problem
-        
+        self.origin = np.array(arm_problem.start(), dtype=float) % self.STEP
+        self.num_joints = self.origin.size
+        self._places = [self.NUM_STEPS ** i for i in range(self.num_joints)]
+        self._start = self.state_id(arm_problem.start())
+        self._goal = self.state_id(arm_problem.goal())
+        self._goal_angles = self.angles(self._goal)
+        self.cache = cache
+        if cache is not None:
+            cache.attach(self)
+        if validator is not None:
+            other = validator.arm_problem
+            if (list(other.arm.lengths) != list(arm_problem.arm.lengths) or
+                    list(other.obstacles) != list(arm_problem.obstacles)):
+                raise ValueError("ParallelValidator for a different arm "
+                                 "or obstacles")
+        self.validator = validator
+        self._edge_configurations = (
+            math.ceil(self.STEP / arm_problem.MAX_ANGLE_DELTA) > 1)
+        self._prefetched = {}         # step -> (vertex_valid, edge_valid)
+        self._prefetched_states = set()
+        self.step_checks = 0
+
+    def state_id(self, q):
+        """ State of the lattice point nearest the joint angles q. """
+        steps = np.round((np.asarray(q, dtype=float) - self.origin) /
+                         self.STEP).astype(int) % self.NUM_STEPS
+        return sum(int(step) * place
+                   for step, place in zip(steps, self._places))
+
+    def lattice_index(self, state):
+        """ Tuple of lattice indices, one per joint. """
+        index = []
+        for _ in range(self.num_joints):
+            state, step = divmod(state, self.NUM_STEPS)
+            index.append(step)
+        return tuple(index)
+
+    def angles(self, state):
+        """ Joint angles of state, each in [-180, 180). """
+        q = self.origin + self.STEP * np.array(self.lattice_index(state))
+        return (q + 180.0) % 360.0 - 180.0
+
     def start(self):
-        return ArmState(self.arm_problem.start())
+        return self._start
 
     def goal(self):
-        return ArmState(self.arm_problem.goal())
-
-    def _new_state(self, state, index, offset):
-            new_q = np.array(state.q)
-            new_q[index] += offset
-            if new_q[index] < -180.0:
-                new_q[index] = 360. - new_q[index]
-            if new_q[index]>180.:
-                new_q[index] = new_q[index] - 360.
-            return ArmState(new_q)
-        
-    def successors(self, state):
+        return self._goal
+
+    def neighbors(self, state):
+        """ States one step from state, without collision checks. """
         next_states = []
-        for i in range(state.q.size):
-            new_state = self._new_state(state, i, -5.0)
-            if self.arm_problem.step_ok(state.q, new_state.q):
-                next_states.append(new_state)
-            new_state = self._new_state(state, i, 5.0)
-            if self.arm_problem.step_ok(state.q, new_state.q):
-                next_states.append(new_state)
+        for step, place in zip(self.lattice_index(state), self._places):
+            for next_step in [(step - 1) % self.NUM_STEPS,
+                              (step + 1) % self.NUM_STEPS]:
+                next_states.append(state + (next_step - step) * place)
         return next_states
 
-            
+    def prefetch(self, states):
+        """Check the steps out of each of states on the validator's
+        workers, so that successors needs no checks of its own for them.
+        Each configuration and edge is sent once, however many of the
+        steps share it, and results the cache already has are not sent.
+        Results for states not in this batch are dropped.  Does nothing
+        without a validator.
+
+        """
+        if self.validator is None:
+            return
+        states = list(dict.fromkeys(states))
+        steps = [(state, next_state) for state in states
+                 for next_state in self.neighbors(state)]
+        old = self._prefetched
+        self._prefetched = dict((step, old[step]) for step in steps
+                                if step in old)
+        self._prefetched_states = set(states)
+        cache = self.cache
+        new_steps = [step for step in steps if step not in self._prefetched]
+
+        vertices = list(dict.fromkeys(
+            next_state for _, next_state in new_steps
+            if cache is None or cache.known_vertex(next_state) is None))
+        vertex_valid = dict(zip(vertices, self.validator.check_configs(
+            [self.angles(state) for state in vertices])))
+
+        edge_valid = {}
+        if self._edge_configurations:
+            edges = {}
+            for state, next_state in new_steps:
+                if next_state in vertex_valid:
+                    vertex = vertex_valid[next_state]
+                else:
+                    vertex = cache.known_vertex(next_state)
+                if vertex and (cache is None or cache.known_edge(
+                        state, next_state) is None):
+                    edges.setdefault(self._edge_key(state, next_state),
+                                     (state, next_state))
+            edge_valid = dict(zip(edges, self.validator.check_edges(
+                [(self.angles(state), self.angles(next_state))
+                 for state, next_state in edges.values()])))
+
+        # None means "not checked here": the cache has it, or the arm
+        # collides at next_state so the edge does not matter.
+        for state, next_state in new_steps:
+            if self._edge_configurations:
+                edge = edge_valid.get(self._edge_key(state, next_state))
+            else:
+                edge = True
+            self._prefetched[(state, next_state)] = (
+                vertex_valid.get(next_state), edge)
+
+    def _edge_key(self, state, next_state):
+        return (min(state, next_state), max(state, next_state))
+
+    def step_ok(self, state, next_state):
+        """ True if the arm can move from state to next_state. """
+        self.step_checks += 1
+        prefetched = self._prefetched.get((state, next_state))
+        if self.cache is not None:
+            return self.cache.step_ok(state, next_state, prefetched)
+        if prefetched is not None:
+            vertex, edge = prefetched
+            if not vertex:
+                return False
+            if edge is not None:
+                return edge
+        return self.arm_problem.step_ok(self.angles(state),
+                                        self.angles(next_state))
+
+    def successors(self, state):
+        if (self.validator is not None and
+                state not in self._prefetched_states):
+            self.prefetch([state])
+        return [next_state for next_state in self.neighbors(state)
+                if self.step_ok(state, next_state)]
 
     def cost(self, state, next_state):
-        #return np.max(np.abs(state.q - next_state.q))
-        return angle_metric_l2(state.q, next_state.q)
+        return angle_metric_l2(self.angles(state), self.angles(next_state))
 
     def heuristic(self, state):
-        return angle_metric_l2(state.q, self.arm_problem.goal())
+        return angle_metric_l2(self.angles(state), self._goal_angles)
+
 
-            
 def construct_path(node):
     path = [node.state]
     cur_node = node.parent
@@ -244,7 +608,7 @@ class CostNode:
         return not self == rhs
 
     def __hash__(self):
-        return hash(str(self.state))
+        return hash(self.state)
 
     def __repr__(self):
         if self.parent is not None:
@@ -256,83 +620,450 @@ class CostNode:
                                          self.path_cost)
 
 
-def dijkstra_search(problem):
-    frontier = PriorityQueue()
-    closed = set()
+class LazyNode(CostNode):
+    """ Frontier entry of lazy_astar_search for a step from parent_node
+    that has not been checked.  Steps to the same state from different
+    parents are different entries. """
 
-    start_node = CostNode(problem.start(), None, 0.0)
-    frontier.add(start_node, 0)
-    exp_count = 0
-    
+    def __eq__(self, rhs):
+        if not isinstance(rhs, LazyNode):
+            return False
+        return self.state == rhs.state and self.parent is rhs.parent
 
-    while not frontier.is_empty():
-        exp_count += 1
-        cur_node = frontier.pop()
-        cur_state = cur_node.state
-        closed.add(cur_state)
+    def __hash__(self):
+        return hash((self.state, id(self.parent)))
 
-        if cur_state == problem.goal():
-            path =  construct_path(cur_node)
-            print(cur_node.path_cost)
-            print("Expansions: {}".format(exp_count))
-            return construct_path(cur_node)
-         
-        else:
-            successors = problem.successors(cur_state)
-            for next_state in successors:
-                cost = problem.cost(cur_state, next_state)
-                next_node = CostNode(next_state, cur_node, cost)
-                if next_state not in closed:
-                    frontier.add(next_node, next_node.path_cost)
-    return None
 
+SUCCESS = 'success'
+TIMEOUT = 'timeout'
+EXHAUSTED = 'exhausted'
+NO_PATH = 'no path'
 
-def astar_search(problem):
+
+class SearchResult(object):
+    """
+    Outcome of dijkstra_search, astar_search and lazy_astar_search:
+
+    status       - SUCCESS, TIMEOUT (the deadline passed), EXHAUSTED
+                   (max_expansions ran out) or NO_PATH (the goal cannot
+                   be reached)
+    path         - path to the goal, or None unless status is SUCCESS
+    partial_path - path to the goal on success, otherwise to the
+                   expanded state with the lowest heuristic, the one
+                   the search got closest to the goal
+    path_cost    - cost of partial_path
+    expansions   - states whose successors were generated
+    seconds      - wall-clock time of the search
+    stats        - the SearchStats passed to the search, or None
+    """
+
+    def __init__(self, status, node, expansions, seconds, stats):
+        self.status = status
+        self.partial_path = construct_path(node)
+        self.path = self.partial_path if status == SUCCESS else None
+        self.path_cost = node.path_cost
+        self.expansions = expansions
+        self.seconds = seconds
+        self.stats = stats
+
+    def __repr__(self):
+        return ("SearchResult(status={!r}, path_cost={:.3f}, "
+                "path_length={}, expansions={}, seconds={:.3f})".format(
+                    self.status, self.path_cost, len(self.partial_path),
+                    self.expansions, self.seconds))
+
+
+def _bounded_search(problem, use_heuristic, stats, deadline,
+                    max_expansions, batch=1, lazy=False):
+    """Best-first search for dijkstra_search, astar_search and, with lazy,
+    lazy_astar_search.
+
+    """
+    start_time = time.perf_counter()
     frontier = PriorityQueue()
     closed = set()
+    if stats is not None:
+        problem, frontier = stats.instrument(problem, frontier, closed)
 
-    start_node = CostNode(problem.start(), None, 0.0)
+    goal = problem.goal()
+    Node = LazyNode if lazy else CostNode
+    start_node = Node(problem.start(), None, 0.0)
     frontier.add(start_node, 0)
-    exp_count = 0
+    closest = start_node
+    closest_h = INF
+    expansions = 0
+    status = NO_PATH
 
     while not frontier.is_empty():
-        exp_count += 1
+        if max_expansions is not None and expansions >= max_expansions:
+            status = EXHAUSTED
+            break
+        if deadline is not None and time.perf_counter() >= deadline:
+            status = TIMEOUT
+            break
         cur_node = frontier.pop()
         cur_state = cur_node.state
+        if cur_state in closed:
+            continue
+        if (lazy and cur_node.parent is not None and
+                not problem.step_ok(cur_node.parent.state, cur_state)):
+            continue
         closed.add(cur_state)
 
-        if cur_state == problem.goal():
-            path =  construct_path(cur_node)
-            print(cur_node.path_cost)
-            print("Expansions: {}".format(exp_count))
-            return construct_path(cur_node)
-         
+        if cur_state == goal:
+            status = SUCCESS
+            closest = cur_node
+            break
+
+        h = problem.heuristic(cur_state)
+        if h < closest_h:
+            closest = cur_node
+            closest_h = h
+        expansions += 1
+        if batch > 1:
+            problem.prefetch([cur_state] + [
+                node.state for node in frontier.top(batch - 1)])
+        if lazy:
+            next_states = problem.neighbors(cur_state)
         else:
-            successors = problem.successors(cur_state)
-            for next_state in successors:
-                cost = problem.cost(cur_state, next_state)
-                next_node = CostNode(next_state, cur_node, cost)
-                if next_state not in closed:
-                    f = next_node.path_cost + problem.heuristic(next_state)
-                    frontier.add(next_node, f)
-    return None
+            next_states = problem.successors(cur_state)
+        for next_state in next_states:
+            cost = problem.cost(cur_state, next_state)
+            next_node = Node(next_state, cur_node, cost)
+            if next_state not in closed:
+                priority = next_node.path_cost
+                if use_heuristic:
+                    priority += problem.heuristic(next_state)
+                frontier.add(next_node, priority)
+
+    if stats is not None:
+        stats.finish(closest.path_cost if status == SUCCESS else None)
+    return SearchResult(status, closest, expansions,
+                        time.perf_counter() - start_time, stats)
+
+
+def dijkstra_search(problem, stats=None, deadline=None, max_expansions=None,
+                    batch=1):
+    """Dijkstra's algorithm.  Returns a SearchResult; its path is the
+    cheapest path, if one was found in time.
+
+    The search stops once time.perf_counter() reaches deadline (a
+    wall-clock time, for example time.perf_counter() + 0.05 for a 50 ms
+    budget) or after max_expansions expansions, whichever comes first.
+    With batch > 1, the steps out of the next batch states on the
+    frontier are checked together through problem.prefetch (see
+    ArmProblem) before each expansion.
+    """
+    return _bounded_search(problem, False, stats, deadline, max_expansions,
+                           batch)
+
+
+def astar_search(problem, stats=None, deadline=None, max_expansions=None,
+                 batch=1):
+    """ A* search, with the same arguments and result as dijkstra_search. """
+    return _bounded_search(problem, True, stats, deadline, max_expansions,
+                           batch)
+
+
+
+def lazy_astar_search(problem, stats=None, deadline=None,
+                      max_expansions=None):
+    """A* that checks a step only when the state it leads to is popped,
+    with the same arguments (but batch) and result as astar_search.
+
+    problem must provide neighbors (states one step away, unchecked) and
+    step_ok (see ArmProblem).  Frontier entries are LazyNodes for steps
+    that have not been checked, so a state can be on the frontier once
+    per parent.  If the step from the cheapest parent turns out to be
+    blocked, the entry is dropped and the one from the next cheapest
+    parent is still queued.  Most generated states are never popped, so
+    most steps are never checked.
+    """
+    return _bounded_search(problem, True, stats, deadline, max_expansions,
+                           lazy=True)
+
+
+def ara_star_search(problem, stats=None, deadline=None, max_expansions=None,
+                    initial_weight=3.0, weight_step=.5):
+    """Best path anytime_search.ARAStar finds before deadline (see
+    dijkstra_search) and within max_expansions, using this module's
+    PriorityQueue for OPEN.
+
+    """
+    time_limit = (None if deadline is None
+                  else deadline - time.perf_counter())
+    return anytime_search.ARAStar(problem, initial_weight, weight_step,
+                                  stats, PriorityQueue).search(
+                                      time_limit, max_expansions)
+
+
+class IDAStar(object):
+    """Iterative deepening A* with a transposition table of bounded size,
+    for state spaces too large for the closed set of astar_search.
+
+    Each iteration is a depth-first search that cuts off paths whose
+    g + h exceeds a threshold, so apart from the table it only stores the
+    current path.  The table remembers the lowest g found for each state,
+    and a state reached again with a higher g is pruned.  Once it holds
+    max_nodes states no new ones are added.  Searches still return
+    optimal paths, but the depth-first searches then reach the states
+    left out through many different paths, so the running time grows
+    quickly once max_nodes drops well below the number of states with
+    g + h under the optimal cost.
+
+    The usual IDA* rule of raising the threshold to the smallest f that
+    was cut off needs hundreds of iterations with real valued costs, so
+    the next threshold is read off a histogram of the cut off f values
+    such that each iteration expands about twice as many states as the
+    one before (Sarkar et al., "Reducing reexpansions in iterative
+    deepening search by controlling cutoff bounds", Artificial
+    Intelligence 50, 1991).  That can overshoot the optimal cost, so the
+    last iteration lowers the threshold to the cheapest path found so
+    far and keeps searching until no cheaper path can exist.
+
+    After search returns:
+      path        - the optimal path, or None
+      path_cost   - its cost
+      iterations  - depth-first searches run
+      expansions  - states expanded by all of them
+      table_size  - states in the table (never more than max_nodes)
+      peak_depth  - longest path held by the depth-first search
+    """
+
+    NUM_BUCKETS = 50
+
+    def __init__(self, problem, max_nodes=100000, stats=None):
+        self.problem = problem
+        self.max_nodes = max_nodes
+        self.stats = stats
+
+    def _cut_off(self, f):
+        bucket = int((f - self.threshold) / self.bucket_width)
+        self.histogram[min(bucket, self.NUM_BUCKETS - 1)] += 1
+        self.lowest_cut_off = min(self.lowest_cut_off, f)
+
+    def _next_threshold(self, iteration_expansions):
+        """Smallest bucket boundary that lets through as many states as the
+        last iteration expanded.
+
+        """
+        count = 0
+        for bucket, bucket_count in enumerate(self.histogram):
+            count += bucket_count
+            if count >= iteration_expansions:
+                break
+        return max(self.lowest_cut_off,
+                   self.threshold + (bucket + 1) * self.bucket_width)
+
+    def _depth_first(self, state, g, path):
+        """ Search below state, which path (an ordered dict) ends with. """
+        problem = self.problem
+        if state == self.goal:
+            if g < self.path_cost:
+                self.path = list(path)
+                self.path_cost = g
+                self.threshold = g
+            return
+        entry = self.table.get(state)
+        if entry is not None:
+            best_g, iteration = entry
+            if best_g < g or (best_g == g and iteration == self.iterations):
+                return
+        if entry is not None or len(self.table) < self.max_nodes:
+            self.table[state] = (g, self.iterations)
+        self.expansions += 1
+        self.peak_depth = max(self.peak_depth, len(path))
+
+        children = []
+        for next_state in problem.successors(state):
+            if next_state in path:
+                continue
+            next_g = g + problem.cost(state, next_state)
+            children.append((next_g + problem.heuristic(next_state), next_g,
+                             next_state))
+        children.sort(key=lambda child: child[0])
+        for f, next_g, next_state in children:
+            if f > self.threshold or f >= self.path_cost:
+                if self.path is None:
+                    self._cut_off(f)
+                continue
+            path[next_state] = None
+            self._depth_first(next_state, next_g, path)
+            del path[next_state]
+
+    def search(self):
+        problem = self.problem
+        self.table = {}
+        self.path = None
+        self.path_cost = INF
+        self.iterations = 0
+        self.expansions = 0
+        self.peak_depth = 0
+        if self.stats is not None:
+            self.problem, _ = self.stats.instrument(problem, None,
+                                                    self.table)
+        start = problem.start()
+        self.goal = problem.goal()
+        self.threshold = problem.heuristic(start)
+        self.bucket_width = max(self.threshold, 1.0) / self.NUM_BUCKETS
+        try:
+            while self.path is None:
+                self.iterations += 1
+                self.histogram = [0] * self.NUM_BUCKETS
+                self.lowest_cut_off = INF
+                expansions = self.expansions
+                self._depth_first(start, 0.0, {start: None})
+                if self.lowest_cut_off == INF:
+                    break
+                if self.path is None:
+                    self.threshold = self._next_threshold(self.expansions -
+                                                          expansions)
+        finally:
+            self.problem = problem
+            if self.stats is not None:
+                self.stats.peak_frontier = max(self.stats.peak_frontier,
+                                               self.peak_depth)
+                self.stats.finish(None if self.path is None
+                                  else self.path_cost)
+        self.table_size = len(self.table)
+        return self.path
+
+
+def ida_star_search(problem, max_nodes=100000, stats=None):
+    """ Optimal path found while storing at most max_nodes states. """
+    return IDAStar(problem, max_nodes, stats).search()
+
+
+def benchmark_arm_problem(num_links, goal_angle=90.0):
+    """ Arm problem turning the first joint of an arm with num_links
+    links by goal_angle past the obstacles of main. """
+    from shapely.geometry import Point
+    obstacles = [Point(-40, 60).buffer(10), Point(40, 60).buffer(10)]
+    start = [0.0] * num_links
+    goal = [goal_angle] + [0.0] * (num_links - 1)
+    return ArmProblemArm(start, goal, obstacles=obstacles)
+
+
+def lazy_benchmark(link_counts, goal_angle=90.0, time_limit=60.0):
+    """Count the steps checked by astar_search and lazy_astar_search for
+    the benchmark_arm_problem with each number of links.  Each search
+    stops after time_limit seconds (None for no limit); the checks of a
+    search that timed out are a lower bound.
+
+    """
+    print("{:>5} {:>6} {:>9} {:>10} {:>9} {:>8}".format(
+        "links", "search", "status", "checks", "seconds", "cost"))
+    for num_links in link_counts:
+        arm_problem = benchmark_arm_problem(num_links, goal_angle)
+        for name, search in [('eager', astar_search),
+                             ('lazy', lazy_astar_search)]:
+            problem = ArmProblem(arm_problem)
+            stats = SearchStats()
+            deadline = (None if time_limit is None
+                        else time.perf_counter() + time_limit)
+            result = search(problem, stats, deadline)
+            print("{:>5} {:>6} {:>9} {:>10} {:>9.2f} {:>8}".format(
+                num_links, name, result.status, problem.step_checks,
+                stats.total_time, "-" if result.path is None
+                else result.path_cost))
+
+
+def parallel_benchmark(num_links, worker_counts, batch=1, goal_angle=90.0):
+    """Time astar_search on the benchmark_arm_problem with num_links
+    links, serially and with a ParallelValidator for each number of
+    workers, checking the steps out of batch frontier states at a time.
+
+    """
+    arm_problem = benchmark_arm_problem(num_links, goal_angle)
+    stats = SearchStats()
+    expected = astar_search(ArmProblem(arm_problem), stats).path
+    print("{:>7} {:>5} {:>9} {:>8} {:>5}".format(
+        "workers", "batch", "seconds", "speedup", "same"))
+    print("{:>7} {:>5} {:>9.2f} {:>8.2f} {:>5}".format(
+        "serial", 1, stats.total_time, 1.0, "yes"))
+    for num_workers in worker_counts:
+        with ParallelValidator(arm_problem, num_workers) as validator:
+            parallel_stats = SearchStats()
+            path = astar_search(ArmProblem(arm_problem, validator=validator),
+                                parallel_stats, batch=batch).path
+        print("{:>7} {:>5} {:>9.2f} {:>8.2f} {:>5}".format(
+            num_workers, batch, parallel_stats.total_time,
+            stats.total_time / parallel_stats.total_time,
+            "yes" if path == expected else "NO"))
+
 
-    
 def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--lazy", type=int, nargs='*', metavar="LINKS",
+                        help="compare the collision checks of A* and lazy "
+                        "A* for arms with these numbers of links (default "
+                        "2; 3 and 4 take minutes) instead of planning; "
+                        "each stops after --time-limit seconds (default "
+                        "60)")
+    parser.add_argument("--workers", type=int, nargs='*',
+                        help="time A* with parallel step checks on this "
+                        "many worker processes (default 1 2 4) instead of "
+                        "planning")
+    parser.add_argument("--links", type=int, default=3,
+                        help="number of links for --workers (default 3)")
+    parser.add_argument("--batch", type=int, default=1,
+                        help="frontier states checked together for "
+                        "--workers (default 1)")
+    parser.add_argument("--search", default='astar',
+                        choices=['astar', 'dijkstra', 'lazy', 'ara', 'ida'],
+                        help="search to plan with (default astar)")
+    parser.add_argument("--time-limit", type=float,
+                        help="stop planning after this many seconds "
+                        "(all but ida)")
+    parser.add_argument("--max-expansions", type=int,
+                        help="stop planning after this many expansions "
+                        "(all but ida)")
+    parser.add_argument("--max-nodes", type=int, default=100000,
+                        help="transposition table size for ida (default "
+                        "100000)")
+    args = parser.parse_args()
+    if args.lazy is not None:
+        lazy_benchmark(args.lazy or [2], time_limit=(
+            60.0 if args.time_limit is None else args.time_limit))
+        return
+    if args.workers is not None:
+        parallel_benchmark(args.links, args.workers or [1, 2, 4],
+                           args.batch)
+        return
+
     from shapely.geometry import Point
     np.random.seed(13)
     obs1 = Point(-40, 60).buffer(10)
     obs2 = Point(40, 60).buffer(10)
     prob = ArmProblemArm([0., 0.], [90., 0.], goal_tolerance=10.,
                       obstacles=[obs1, obs2])
-    grid_prob = ArmProblem(prob)               
-    path = astar_search(grid_prob)
-    #path = dijkstra_search(grid_prob)
+    cache = ValidityCache()
+    grid_prob = ArmProblem(prob, cache)
+    stats = SearchStats()
+    deadline = (None if args.time_limit is None
+                else time.perf_counter() + args.time_limit)
+    if args.search in ['astar', 'dijkstra', 'lazy']:
+        search = {'astar': astar_search, 'dijkstra': dijkstra_search,
+                  'lazy': lazy_astar_search}[args.search]
+        search_result = search(grid_prob, stats, deadline,
+                               args.max_expansions)
+        print(search_result)
+        path = search_result.partial_path
+    elif args.search == 'ara':
+        path = ara_star_search(grid_prob, stats, deadline,
+                               args.max_expansions)
+    else:
+        planner = IDAStar(grid_prob, args.max_nodes, stats)
+        path = planner.search()
+        print("table: {} of {} states, path depth {}".format(
+            planner.table_size, planner.max_nodes, planner.peak_depth))
+    print(stats)
+    print(cache)
     print(path)
     result = []
     if path is not None:
         for step in path:
-            result.append(step.q)
+            result.append(grid_prob.angles(step))
     print(result)
     prob.animate_plan(result)
     
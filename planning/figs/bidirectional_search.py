@@ -0,0 +1,139 @@
+""" Bidirectional Dijkstra and A* search.
+
+Both searches grow one tree forward from the start and one backward from
+the goal, always expanding on the side whose smallest key is lower.
+Every time a state has been reached from both sides the length of the
+connecting path is recorded, and the search stops as soon as the sum of
+the two smallest keys is at least the best connecting path found so far.
+
+Bidirectional A* uses the average potential
+
+    p(s) = (heuristic(s) - reverse_heuristic(s)) / 2
+
+for the forward search and -p(s) for the backward search.  This keeps
+both searches consistent, so the same stopping rule is correct.
+
+Reference: Goldberg and Harrelson, "Computing the Shortest Path: A*
+Search Meets Graph Theory", SODA 2005.
+
+The problem must provide predecessors (and reverse_heuristic for A*) in
+addition to the usual methods.
+"""
+import book_search
+
+INF = float('inf')
+
+
+class BidirectionalSearch(object):
+    """After search returns, expansions holds the number of states expanded
+    by both directions together and path_cost the cost of the returned
+    path.
+
+    """
+
+    def __init__(self, problem, use_heuristic=True):
+        self.problem = problem
+        self.use_heuristic = use_heuristic
+        self.expansions = 0
+        self.path_cost = INF
+
+    def _potential(self, state):
+        if not self.use_heuristic:
+            return 0.0
+        return .5 * (self.problem.heuristic(state) -
+                     self.problem.reverse_heuristic(state))
+
+    def events(self):
+        """Generator of book_search.SearchEvents.  Events from the two
+        directions are interleaved; the frontier states of both are
+        reported together.
+
+        """
+        problem = self.problem
+        start = problem.start()
+        goal = problem.goal()
+        self.expansions = 0
+
+        frontiers = [book_search.IndexedPriorityQueue(),
+                     book_search.IndexedPriorityQueue()]
+        closed = [set(), set()]
+        nodes = [{}, {}]          # best node found so far for each state
+        signs = [1.0, -1.0]       # forward uses p, backward uses -p
+
+        for side, state in enumerate([start, goal]):
+            node = book_search.CostNode(state, None, 0.0)
+            nodes[side][state] = node
+            frontiers[side].add(node, signs[side] * self._potential(state))
+
+        best_cost = 0.0 if start == goal else INF
+        meeting_state = start if start == goal else None
+
+        while not (frontiers[0].is_empty() or frontiers[1].is_empty()):
+            if (frontiers[0].top_priority() + frontiers[1].top_priority() >=
+                    best_cost):
+                break
+            side = (0 if frontiers[0].top_priority() <=
+                    frontiers[1].top_priority() else 1)
+            other = 1 - side
+            cur_node = frontiers[side].pop()
+            cur_state = cur_node.state
+            closed[side].add(cur_state)
+            self.expansions += 1
+            added = []
+
+            if side == 0:
+                next_states = problem.successors(cur_state)
+            else:
+                next_states = problem.predecessors(cur_state)
+            for next_state in next_states:
+                if next_state in closed[side]:
+                    continue
+                if side == 0:
+                    cost = problem.cost(cur_state, next_state)
+                else:
+                    cost = problem.cost(next_state, cur_state)
+                path_cost = cur_node.path_cost + cost
+                old_node = nodes[side].get(next_state)
+                if old_node is not None and old_node.path_cost <= path_cost:
+                    continue
+                next_node = book_search.CostNode(next_state, cur_node, cost)
+                nodes[side][next_state] = next_node
+                frontiers[side].add(next_node, path_cost + signs[side] *
+                                    self._potential(next_state))
+                added.append(next_state)
+                other_node = nodes[other].get(next_state)
+                if (other_node is not None and
+                        path_cost + other_node.path_cost < best_cost):
+                    best_cost = path_cost + other_node.path_cost
+                    meeting_state = next_state
+
+            yield book_search.SearchEvent(cur_state, added, None)
+
+        self.path_cost = best_cost
+        if meeting_state is None:
+            return
+        path = book_search.construct_path(nodes[0][meeting_state])
+        backward = book_search.construct_path(nodes[1][meeting_state])
+        backward.reverse()
+        path.extend(backward[1:])
+        yield book_search.SearchEvent(meeting_state, [], path)
+
+    def search(self, vis=None):
+        return book_search.run_search(self.events(), vis)
+
+
+def bidirectional_dijkstra_search(problem, vis=None):
+    return BidirectionalSearch(problem, use_heuristic=False).search(vis)
+
+
+def bidirectional_astar_search(problem, vis=None):
+    return BidirectionalSearch(problem, use_heuristic=True).search(vis)
+
+
+def main():
+    p = book_search.load_grid_problem('filled_grid_cells.dat')
+    book_search.GridVisualizer(p, bidirectional_astar_search)
+
+
+if __name__ == "__main__":
+    main()
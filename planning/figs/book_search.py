@@ -2,27 +2,72 @@ import tempfile
 import shutil
 import subprocess
 import argparse
+import collections
+import json
+import time
 import six
 import heapq
+import itertools
 import math
+import numpy as np
 import pygame
 
-class Queue(list):
+class DequeCollection(object):
+    """
+    Base class for the Queue and Stack collections used by the generic
+    searches.  Items are stored in a deque, and a companion dictionary
+    counts how many copies of each item are stored, so that membership
+    tests are O(1) instead of a linear scan.  Items must be hashable;
+    Node hashes on its state.
+    """
+
+    def __init__(self):
+        self.items = collections.deque()
+        self.members = {}
 
     def add(self, item):
-        self.insert(0, item)
+        self.items.append(item)
+        self.members[item] = self.members.get(item, 0) + 1
+
+    def _take(self):
+        raise NotImplementedError
+
+    def pop(self):
+        item = self._take()
+        count = self.members[item]
+        if count == 1:
+            del self.members[item]
+        else:
+            self.members[item] = count - 1
+        return item
 
     def is_empty(self):
-        return len(self) == 0
+        return len(self.items) == 0
 
-class Stack(list):
+    def __len__(self):
+        return len(self.items)
+
+    def __contains__(self, item):
+        return item in self.members
+
+    def __iter__(self):
+        return iter(self.items)
+
+
+class Queue(DequeCollection):
+    """ First in, first out. """
+
+    def _take(self):
+        return self.items.popleft()
+
+
+class Stack(DequeCollection):
+    """ Last in, first out. """
+
+    def _take(self):
+        return self.items.pop()
 
-    def add(self, item):
-        self.append(item)
 
-    def is_empty(self):
-        return len(self) == 0
-    
 # Borrowed from CS188 pacman project.
 class PriorityQueue:
     """
@@ -50,25 +95,352 @@ class PriorityQueue:
     def add(self, item, priority):
         # If item already in priority queue with higher priority,
         # update its priority and rebuild the heap.  If item already
-        # in priority queue with equal or lower priority, do nothing.
-        # If item not in priority queue, do the same thing as
-        # self.push.
+        # in priority queue with equal or lower priority, do nothing
+        # and return False.  If item not in priority queue, do the same
+        # thing as self.push.
         for index, (p, c, i) in enumerate(self.heap):
             if i == item:
                 if p <= priority:
-                    break
+                    return False
                 del self.heap[index]
                 self.heap.append((priority, c, item))
                 heapq.heapify(self.heap)
+                return True
+        self._add(item, priority)
+        return True
+
+    def __iter__(self):
+        return [item[2] for item in self.heap].__iter__()
+
+
+class IndexedPriorityQueue(object):
+    """
+    Binary heap priority queue that tracks the heap slot of every stored
+    item.  Items with equal keys (according to __eq__ and __hash__) are
+    treated as duplicates: adding an item that is already present only
+    has an effect if the new priority is lower, in which case the stored
+    item is replaced and moved up the heap (decrease-key).
+
+    add and pop are O(log n), membership tests are O(1).
+    """
+
+    def __init__(self):
+        self.heap = []    # entries are [priority, count, item]
+        self.index = {}   # item -> position of its entry in self.heap
+        self.count = 0
+
+    def add(self, item, priority):
+        """Add item, or lower its priority if it is already present.
+        Returns False if the queue was left unchanged because the item
+        was already present with a priority at least as low.
+
+        """
+        pos = self.index.get(item)
+        if pos is None:
+            entry = [priority, self.count, item]
+            self.count += 1
+            self.heap.append(entry)
+            self.index[item] = len(self.heap) - 1
+            self._sift_up(len(self.heap) - 1)
+        else:
+            entry = self.heap[pos]
+            if entry[0] <= priority:
+                return False
+            entry[0] = priority
+            entry[2] = item
+            self._sift_up(pos)
+        return True
+
+    def pop(self):
+        """ Remove and return the lowest priority item. """
+        heap = self.heap
+        last = heap.pop()
+        if heap:
+            top = heap[0]
+            heap[0] = last
+            self.index[last[2]] = 0
+            self._sift_down(0)
+        else:
+            top = last
+        del self.index[top[2]]
+        return top[2]
+
+    def update(self, item, priority):
+        """ Add item, or change its priority (up or down) if present. """
+        pos = self.index.get(item)
+        if pos is None:
+            self.add(item, priority)
+        else:
+            entry = self.heap[pos]
+            entry[0] = priority
+            entry[2] = item
+            self._sift_up(pos)
+            self._sift_down(self.index[item])
+
+    def remove(self, item):
+        """ Remove a stored item. Raises KeyError if it is not present. """
+        pos = self.index.pop(item)
+        last = self.heap.pop()
+        if pos < len(self.heap):
+            self.heap[pos] = last
+            self.index[last[2]] = pos
+            self._sift_up(pos)
+            self._sift_down(self.index[last[2]])
+
+    def priority(self, item):
+        """ Return the current priority of a stored item. """
+        return self.heap[self.index[item]][0]
+
+    def top_priority(self):
+        """ Return the lowest priority in the queue without removing it. """
+        return self.heap[0][0]
+
+    def is_empty(self):
+        return len(self.heap) == 0
+
+    def __len__(self):
+        return len(self.heap)
+
+    def __contains__(self, item):
+        return item in self.index
+
+    def __iter__(self):
+        return [entry[2] for entry in self.heap].__iter__()
+
+    def _sift_up(self, pos):
+        heap = self.heap
+        index = self.index
+        entry = heap[pos]
+        while pos > 0:
+            parent_pos = (pos - 1) >> 1
+            parent = heap[parent_pos]
+            if entry < parent:
+                heap[pos] = parent
+                index[parent[2]] = pos
+                pos = parent_pos
+            else:
                 break
+        heap[pos] = entry
+        index[entry[2]] = pos
+
+    def _sift_down(self, pos):
+        heap = self.heap
+        index = self.index
+        size = len(heap)
+        entry = heap[pos]
+        child_pos = 2 * pos + 1
+        while child_pos < size:
+            right_pos = child_pos + 1
+            if right_pos < size and heap[right_pos] < heap[child_pos]:
+                child_pos = right_pos
+            child = heap[child_pos]
+            if child < entry:
+                heap[pos] = child
+                index[child[2]] = pos
+                pos = child_pos
+                child_pos = 2 * pos + 1
+            else:
+                break
+        heap[pos] = entry
+        index[entry[2]] = pos
+
+
+class LazyPriorityQueue(object):
+    """
+    heapq based priority queue that handles decrease-key by pushing a new
+    entry and marking the old one as removed.  Membership is O(1), but the
+    heap can hold stale entries until they reach the top.
+    """
+    REMOVED = '<removed>'
+
+    def __init__(self):
+        self.heap = []
+        self.entry_finder = {}
+        self.count = 0
+
+    def add(self, item, priority):
+        entry = self.entry_finder.get(item)
+        if entry is not None:
+            if entry[0] <= priority:
+                return False
+            entry[2] = self.REMOVED
+        entry = [priority, self.count, item]
+        self.count += 1
+        self.entry_finder[item] = entry
+        heapq.heappush(self.heap, entry)
+        return True
+
+    def pop(self):
+        while self.heap:
+            _, _, item = heapq.heappop(self.heap)
+            if item is not self.REMOVED:
+                del self.entry_finder[item]
+                return item
+        raise KeyError("Pop from empty priority queue")
+
+    def is_empty(self):
+        return len(self.entry_finder) == 0
+
+    def __len__(self):
+        return len(self.entry_finder)
+
+    def __contains__(self, item):
+        return item in self.entry_finder
+
+    def __iter__(self):
+        return [entry[2] for entry in self.entry_finder.values()].__iter__()
+
+
+class BucketQueue(object):
+    """
+    Monotone bucket queue for searches whose priorities never drop much
+    below the last popped priority, such as Dijkstra or A* with a
+    consistent heuristic on grids with a few distinct step costs.
+
+    Priorities are grouped into buckets of width bucket_width.  Only the
+    lowest non-empty bucket is kept as a heap, so its items still come out
+    in exact priority order; later buckets are plain lists that are
+    heapified when they are reached.  Items added with a priority below
+    the current bucket go into the current heap, so the queue stays
+    correct even if priorities are not monotone.  Decrease-key marks the
+    old entry as removed.
+    """
+    REMOVED = '<removed>'
+
+    def __init__(self, bucket_width=1.0):
+        self.bucket_width = float(bucket_width)
+        self.buckets = []
+        self.current = 0
+        self.current_heap = []
+        self.infinite = []
+        self.entry_finder = {}
+        self.count = 0
+
+    def add(self, item, priority):
+        entry = self.entry_finder.get(item)
+        if entry is not None:
+            if entry[0] <= priority:
+                return False
+            entry[2] = self.REMOVED
+        entry = [priority, self.count, item]
+        self.count += 1
+        self.entry_finder[item] = entry
+
+        if priority == float('inf'):
+            self.infinite.append(entry)
+            return True
+        bucket = int(priority // self.bucket_width)
+        if bucket <= self.current:
+            heapq.heappush(self.current_heap, entry)
         else:
-            self._add(item, priority)
+            if bucket >= len(self.buckets):
+                self.buckets.extend([] for _ in
+                                    range(bucket + 1 - len(self.buckets)))
+            self.buckets[bucket].append(entry)
+        return True
+
+    def pop(self):
+        while self.entry_finder:
+            while self.current_heap:
+                _, _, item = heapq.heappop(self.current_heap)
+                if item is not self.REMOVED:
+                    del self.entry_finder[item]
+                    return item
+            self.current += 1
+            if self.current < len(self.buckets):
+                self.current_heap = self.buckets[self.current]
+                self.buckets[self.current] = None
+            else:
+                self.current_heap = self.infinite
+                self.infinite = []
+                self.current = float('inf')
+            heapq.heapify(self.current_heap)
+        raise KeyError("Pop from empty priority queue")
+
+    def is_empty(self):
+        return len(self.entry_finder) == 0
+
+    def __len__(self):
+        return len(self.entry_finder)
+
+    def __contains__(self, item):
+        return item in self.entry_finder
 
     def __iter__(self):
-        return [item[2] for item in self.heap].__iter__()
+        return [entry[2] for entry in self.entry_finder.values()].__iter__()
+
+
+# Priority queues that can be passed to dijkstra_search and astar_search.
+# add(item, priority) returns False if it left the queue unchanged, when
+# item was already present with a priority at least as low.
+PRIORITY_QUEUES = {'indexed': IndexedPriorityQueue,
+                   'lazy': LazyPriorityQueue,
+                   'bucket': BucketQueue,
+                   'linear': PriorityQueue}
+
+
+# Searches are generators of SearchEvents, one per expansion:
+#   state - the state that was just removed from the frontier
+#   added - states that were added to the frontier, or whose priority in
+#           it was lowered
+#   path  - the solution, on the final event only; otherwise None
+# If no path exists the generator simply ends.
+SearchEvent = collections.namedtuple('SearchEvent', ['state', 'added', 'path'])
+
+
+def run_search(events, vis=None):
+    """Consume a stream of SearchEvents, passing each one to vis (if
+    given), and return the solution path or None.
+
+    """
+    if vis is not None:
+        vis.reset()
+    path = None
+    for event in events:
+        if vis is not None:
+            vis.update(event)
+        path = event.path
+    if vis is not None:
+        vis.finish()
+    return path
+
+
+class EventVisualizer(object):
+    """
+    Base class for visualizers that consume SearchEvents.  It rebuilds the
+    closed set and the frontier from the events and calls
+    draw(closed, frontier, solution, pause) every draw_every events and
+    on the final event.
+    """
+    draw_every = 1
+
+    def reset(self):
+        self.closed = set()
+        self.frontier = set()
+        self.num_events = 0
+
+    def update(self, event):
+        self.closed.add(event.state)
+        self.frontier.discard(event.state)
+        self.frontier.update(event.added)
+        self.num_events += 1
+        if event.path is not None:
+            self.draw(self.closed, self.frontier, event.path, True)
+        elif self.frame_due():
+            self.draw(self.closed, self.frontier, None, False)
+
+    def frame_due(self):
+        return self.num_events % self.draw_every == 0
+
+    def finish(self):
+        """ Called after the last event, whether or not a path was found. """
+        pass
+
+    def draw(self, closed=None, frontier=None, solution=None, pause=False):
+        raise NotImplementedError
 
 
-class GridVisualizer:
+class GridVisualizer(EventVisualizer):
     FRONTIER_COLOR = (0, 0, 255)
     OBSTACLE_COLOR = (0, 0, 0)
     EXPENSIVE_COLOR = (150, 150,150)
@@ -78,9 +450,31 @@ class GridVisualizer:
     GOAL_COLOR = (255, 178, 0.)
 
     def __init__(self, grid_problem, search_function,
-                 grid_square_size=10, fill=False, save_prefix=None):
+                 grid_square_size=10, fill=False, save_prefix=None,
+                 replanner=None, draw_every=1, frame_rate=30,
+                 compare_replans=False):
+        """
+        replanner - optional incremental planner (see incremental_search)
+                    that is told about every painted cell, so the
+                    displayed path is repaired as the map is edited.
+                    Its expansions are shown in the window caption.
+        compare_replans - also search from scratch after every painted
+                          cell and show those expansions in the caption
+                          (one full search per cell, so painting is slow)
+        draw_every - if frame_rate is None, redraw after this many search
+                     events (every frame is saved when making gifs)
+        frame_rate - frames per second while a search runs; the search
+                     itself is not slowed down to match
+        """
+        self.draw_every = draw_every
+        self.frame_rate = frame_rate
         self.problem = grid_problem
         self.search_function = search_function
+        self.replanner = replanner
+        self.compare_replans = compare_replans
+        self.replan_path = None
+        if replanner is not None:
+            self.replan_path = replanner.plan()
         self.grid_square_size = grid_square_size
         self.fill=fill
         self.margin = 1
@@ -96,48 +490,104 @@ class GridVisualizer:
         self.done = False
         self.save_prefix = save_prefix
         self.count = 0
+
+        # The grid itself is drawn once onto background.  After that only
+        # cells whose label (closed, frontier, path...) changes are
+        # repainted, by copying the cell back from background and drawing
+        # the new label on top.
+        self.background = pygame.Surface(window_size)
+        self.draw_grid()
+        self.screen.blit(self.background, (0, 0))
+        pygame.display.flip()
+        self.labels = {}        # state -> label color shown on screen
+        self.pending = set()    # states touched by events since last frame
+        self.shown_path = []    # solution or replan path on screen
+        self.last_frame = 0
         
         if self.save_prefix:
             self.tmp_dir = tempfile.mkdtemp()
 
         while not self.done:
             self.draw()
+            self.clock.tick(60)
 
-
-    def draw_rect(self, row, column, color, border=0):
-        pygame.draw.rect(self.screen,
-                         color,
-                         [(self.margin + self.grid_square_size) *
-                          column + self.margin,
-                          (self.margin + self.grid_square_size) *
-                          (self.problem.grid_height - row -1) + self.margin,
-                          self.grid_square_size,
-                          self.grid_square_size], border)
+    def reset(self):
+        EventVisualizer.reset(self)
+        self.pending = set(self.labels)
+
+    def update(self, event):
+        self.pending.add(event.state)
+        self.pending.update(event.added)
+        EventVisualizer.update(self, event)
+
+    def frame_due(self):
+        if self.frame_rate is None:
+            return EventVisualizer.frame_due(self)
+        return (pygame.time.get_ticks() - self.last_frame >=
+                1000.0 / self.frame_rate)
+
+    def cell_rect(self, row, column):
+        return pygame.Rect((self.margin + self.grid_square_size) *
+                           column + self.margin,
+                           (self.margin + self.grid_square_size) *
+                           (self.problem.grid_height - row -1) + self.margin,
+                           self.grid_square_size,
+                           self.grid_square_size)
+
+    def draw_rect(self, row, column, color, border=0, surface=None):
+        if surface is None:
+            surface = self.screen
+        rect = self.cell_rect(row, column)
+        pygame.draw.rect(surface, color, rect, border)
+        return rect
+
+    def cell_color(self, state):
+        if  state.cost == float('inf'):
+            return self.OBSTACLE_COLOR
+        elif  state.cost == 2.0:
+            return self.EXPENSIVE_COLOR
+        return (255, 255, 255)
         
     def draw_grid(self):
-        self.screen.fill((0, 0, 0))
+        self.background.fill((0, 0, 0))
          
         for row in range(self.problem.grid_height):
             for column in range(self.problem.grid_width):
-                if  self.problem.grid[row][column].cost == float('inf'):
-                    color = self.OBSTACLE_COLOR
-                elif  self.problem.grid[row][column].cost == 2.0:
-                    color = self.EXPENSIVE_COLOR
-                else:
-                    color = (255, 255, 255)
-                    
-                self.draw_rect(row, column, color)
-
+                self.draw_rect(row, column,
+                               self.cell_color(self.problem.grid[row][column]),
+                               surface=self.background)
+
+    def label_color(self, state, closed, frontier, path):
+        """ The label of state, highest precedence first. """
+        if state == self.problem.goal():
+            return self.GOAL_COLOR
+        if state == self.problem.start():
+            return self.START_COLOR
+        if state in path:
+            return self.SOLUTION_COLOR
+        if frontier is not None and state in frontier:
+            return self.FRONTIER_COLOR
+        if closed is not None and state in closed:
+            return self.CLOSED_COLOR
+        return None
+
+    def repaint(self, state, color):
+        """Restore the cell from the background and draw color (if any)
+        on top.  Returns the screen rectangle that changed.
 
-    def label_states(self, states, color):
-        if states is not None:
-            for state in states:
-                row = state.row
-                column = state.col
-                if self.fill:
-                    self.draw_rect(row, column, color, border=0)
-                else:
-                    self.draw_rect(row, column, color, border=self.margin*2)
+        """
+        rect = self.cell_rect(state.row, state.col)
+        self.screen.blit(self.background, rect, rect)
+        if color is not None:
+            if self.fill:
+                self.draw_rect(state.row, state.col, color, border=0)
+            else:
+                self.draw_rect(state.row, state.col, color,
+                               border=self.margin*2)
+            self.labels[state] = color
+        else:
+            self.labels.pop(state, None)
+        return rect
 
     def draw(self, closed=None, frontier=None, solution=None, pause=False):
 
@@ -149,12 +599,12 @@ class GridVisualizer:
                 pos = pygame.mouse.get_pos()
                 column =  pos[0] // (self.grid_square_size + self.margin)
                 row = pos[1] // (self.grid_square_size + self.margin)
-                row = self.problem.grid_height - row
+                row = self.problem.grid_height - row - 1
                 if event.buttons[0] == 1:
-                    self.problem.grid[row][column].cost = float('inf')
+                    self.set_cost(row, column, float('inf'))
 
                 if event.buttons[2] == 1:
-                    self.problem.grid[row][column].cost = 2.0
+                    self.set_cost(row, column, 2.0)
 
             elif event.type == pygame.MOUSEBUTTONDOWN:
                 if event.button == 2:
@@ -162,15 +612,25 @@ class GridVisualizer:
 
 
         # DRAW STUFF
-        self.draw_grid()
-        self.label_states(closed, self.CLOSED_COLOR)
-        if frontier is not None:
-            self.label_states([node.state for node in frontier],
-                              self.FRONTIER_COLOR)
-        self.label_states(solution, self.SOLUTION_COLOR)
-        self.label_states([self.problem.start()], self.START_COLOR)
-        self.label_states([self.problem.goal()], self.GOAL_COLOR)
-        pygame.display.flip()
+        path = solution if solution is not None else self.replan_path
+        path = path if path is not None else []
+        dirty = self.pending
+        if closed is None and frontier is None:
+            dirty.update(self.labels)
+        dirty.update(self.shown_path)
+        dirty.update(path)
+        dirty.update([self.problem.start(), self.problem.goal()])
+        self.pending = set()
+        self.shown_path = path
+        path = set(path)
+
+        rects = []
+        for state in dirty:
+            color = self.label_color(state, closed, frontier, path)
+            if self.labels.get(state) != color:
+                rects.append(self.repaint(state, color))
+        pygame.display.update(rects)
+        self.last_frame = pygame.time.get_ticks()
 
         if self.save_prefix and closed:
             pygame.image.save(self.screen,
@@ -178,9 +638,6 @@ class GridVisualizer:
                                                         self.save_prefix,
                                                         self.count))
             self.count += 1
-            
-        self.clock.tick(60)
-        
 
         while pause and not self.done:
             for event in pygame.event.get():
@@ -189,57 +646,170 @@ class GridVisualizer:
             self.clock.tick(60)
                     
 
-class AsymptoteVisualizer:
+    def set_cost(self, row, column, cost):
+        if not (0 <= row < self.problem.grid_height and
+                0 <= column < self.problem.grid_width):
+            return
+        state = self.problem.grid[row][column]
+        if state.cost == cost:
+            return
+        state.cost = cost
+        self.draw_rect(row, column, self.cell_color(state),
+                       surface=self.background)
+        pygame.display.update(self.repaint(state, self.labels.get(state)))
+        if self.replanner is not None:
+            self.replanner.cells_changed([state])
+            self.replan_path = self.replanner.plan()
+            caption = "Replan expansions: {}".format(
+                self.replanner.expansions)
+            if self.compare_replans:
+                caption += "  (full search: {})".format(
+                    self.replanner.full_search_expansions())
+            pygame.display.set_caption(caption)
+
+
+# Cell labels stored in search traces.
+TRACE_CLOSED, TRACE_FRONTIER, TRACE_SOLUTION = 1, 2, 3
+
+TRACE_MAGIC = b'GRIDTRC1'
+TRACE_HEADER = np.dtype([('height', '<i4'), ('width', '<i4'),
+                         ('start', '<i4'), ('goal', '<i4'),
+                         ('num_obstacles', '<i4')])
+TRACE_RECORD = np.dtype([('step', '<i4'), ('cell', '<i4'), ('label', 'u1')])
+
+
+class AsymptoteVisualizer(EventVisualizer):
+    """
+    Records a search on a GridProblem to a single binary trace file.  The
+    obstacles are written once, followed by one record per label change:
+    (step, cell, label), where cell is row * width + col.  Each search
+    event only adds records for the states it touches, so the file size
+    and write time grow with the number of changes rather than with the
+    grid size times the number of steps.
+
+    Use SearchTrace to rebuild any step, e.g. as a .dat file for c_obs.asy.
+    """
+    FLUSH_RECORDS = 65536
+
+    def __init__(self, grid_problem, trace_file):
+        self.problem = grid_problem
+        self.trace_file = trace_file
+        self.handle = None
+        
+    def reset(self):
+        EventVisualizer.reset(self)
+        problem = self.problem
+        width = problem.grid_width
+        obstacles = [row * width + column
+                     for row in range(problem.grid_height)
+                     for column in range(width)
+                     if problem.grid[row][column].cost == float('inf')]
+        header = np.array([(problem.grid_height, width,
+                            problem.start().row * width + problem.start().col,
+                            problem.goal().row * width + problem.goal().col,
+                            len(obstacles))], dtype=TRACE_HEADER)
+        self.close()
+        self.handle = open(self.trace_file, 'wb')
+        self.handle.write(TRACE_MAGIC)
+        self.handle.write(header.tobytes())
+        self.handle.write(np.array(obstacles, dtype='<i4').tobytes())
+        self.records = []
+
+    def update(self, event):
+        self.num_events += 1
+        step = self.num_events
+        width = self.problem.grid_width
+        self.records.append((step, event.state.row * width + event.state.col,
+                             TRACE_CLOSED))
+        for state in event.added:
+            self.records.append((step, state.row * width + state.col,
+                                 TRACE_FRONTIER))
+        if event.path is not None:
+            for state in event.path:
+                self.records.append((step, state.row * width + state.col,
+                                     TRACE_SOLUTION))
+        if len(self.records) >= self.FLUSH_RECORDS:
+            self.flush()
+
+    def flush(self):
+        self.handle.write(np.array(self.records,
+                                   dtype=TRACE_RECORD).tobytes())
+        self.records = []
+
+    def close(self):
+        if self.handle is not None:
+            self.flush()
+            self.handle.close()
+            self.handle = None
+
+    finish = close
+
+
+class SearchTrace(object):
+    """
+    Random access reader for the trace files written by
+    AsymptoteVisualizer.  Steps are numbered from 1; step k is the state
+    of the search after k expansions.
+    """
     FRONTIER_COLOR = (0, 0, 1)
     OBSTACLE_COLOR = (0., 0., 0.)
     CLOSED_COLOR = (.7, .7, .7)
     SOLUTION_COLOR = (1, 0, 0)
     START_COLOR = (0, 1, 0)
     GOAL_COLOR = (1, .7, 0)
-    
-    
-    def __init__(self, grid_problem, base_file, which_iterations=None):
-        self.step = 1
-        self.problem = grid_problem
-        self.base_file = base_file
-        self.obstacle_states = []
-        self.which_iterations = which_iterations
-        for row in range(self.problem.grid_height):
-            for column in range(self.problem.grid_width):
-                if self.problem.grid[row][column].cost == float('inf'):
-                    self.obstacle_states.append(self.problem.grid[row][column])
-        
 
-    def label_states(self, states, color, handle):
-        if states is not None:
-            for state in states:
-                handle.write("{}, {}, {}, {}, {}\n".format(state.row, state.col,
-                                                           color[0], color[1],
-                                                           color[2]))
+    def __init__(self, trace_file):
+        with open(trace_file, 'rb') as handle:
+            if handle.read(len(TRACE_MAGIC)) != TRACE_MAGIC:
+                raise ValueError("not a search trace: " + trace_file)
+            header = np.fromfile(handle, dtype=TRACE_HEADER, count=1)[0]
+            self.height = int(header['height'])
+            self.width = int(header['width'])
+            self.start = divmod(int(header['start']), self.width)
+            self.goal = divmod(int(header['goal']), self.width)
+            self.obstacles = np.fromfile(handle, dtype='<i4',
+                                         count=int(header['num_obstacles']))
+            self.records = np.fromfile(handle, dtype=TRACE_RECORD)
+        self.num_steps = (int(self.records['step'][-1])
+                          if len(self.records) else 0)
+
+    def labels(self, step):
+        """ Array of cell labels (0 for none) after the given step. """
+        end = np.searchsorted(self.records['step'], step, side='right')
+        records = self.records[:end]
+        # Only the last record for each cell counts.
+        cells, first = np.unique(records['cell'][::-1], return_index=True)
+        labels = np.zeros(self.height * self.width, dtype=np.uint8)
+        labels[cells] = records['label'][::-1][first]
+        return labels.reshape(self.height, self.width)
+
+    def write_dat(self, step, file_name):
+        """ Write the old one-file-per-step format read by c_obs.asy. """
+        labels = self.labels(step)
+        obstacles = [divmod(int(cell), self.width) for cell in self.obstacles]
+        groups = [(obstacles, self.OBSTACLE_COLOR)]
+        for label, color in [(TRACE_CLOSED, self.CLOSED_COLOR),
+                             (TRACE_FRONTIER, self.FRONTIER_COLOR),
+                             (TRACE_SOLUTION, self.SOLUTION_COLOR)]:
+            groups.append((zip(*np.nonzero(labels == label)), color))
+        groups.append(([self.start], self.START_COLOR))
+        groups.append(([self.goal], self.GOAL_COLOR))
+        lines = ["{}, {}\n".format(self.height, self.width)]
+        for cells, color in groups:
+            lines.extend("{}, {}, {}, {}, {}\n".format(row, col, *color)
+                         for row, col in cells)
+        with open(file_name, 'w') as handle:
+            handle.writelines(lines)
+
+    def write_dats(self, base_file, which_iterations):
+        """Write base_file.format(step) for each of which_iterations and
+        for the final step.
 
+        """
+        for step in sorted(set(which_iterations) | {self.num_steps}):
+            self.write_dat(step, base_file.format(step))
 
-    def draw(self, closed=None, frontier=None, solution=None, pause=False):
-        if (self.which_iterations is None or
-            self.step in self.which_iterations or solution is not None):
-            handle = open(self.base_file.format(self.step), 'w')
-            handle.write("{}, {}\n".format(self.problem.grid_height,
-                                           self.problem.grid_width))
-            
-            
-            self.label_states(self.obstacle_states, self.OBSTACLE_COLOR,
-                              handle)
-            self.label_states(closed, self.CLOSED_COLOR, handle)
-            if frontier is not None:
-                self.label_states([node.state for node in frontier],
-                                  self.FRONTIER_COLOR, handle)
-
-            self.label_states(solution, self.SOLUTION_COLOR, handle)
-            self.label_states([self.problem.start()], self.START_COLOR, handle)
-            self.label_states([self.problem.goal()], self.GOAL_COLOR, handle)
-            handle.close()
-        self.step += 1
-        
-            
+    
 class Problem:
 
     def __init__(self):
@@ -251,13 +821,61 @@ class Problem:
     def goal(self):
         raise NotImplementedError
 
+    def is_goal(self, state):
+        """ True if a search may stop at state. """
+        return state == self.goal()
+
     def successors(self, state):
         raise NotImplementedError
 
+    def predecessors(self, state):
+        """ States from which state is reachable in one step. """
+        raise NotImplementedError
+
     def cost(self, state, next_state):
         raise NotImplementedError
     
 
+class QueryProblem(Problem):
+    """Wrap a problem to pose another query on the same map.  start and
+    goal default to those of the wrapped problem.  With a different goal,
+    heuristic is problem.distance to it (see GridProblem.distance);
+    otherwise it is the wrapped problem's heuristic.
+
+    """
+
+    def __init__(self, problem, start=None, goal=None):
+        self.problem = problem
+        self._start = problem.start() if start is None else start
+        self._goal = problem.goal() if goal is None else goal
+        self._same_goal = goal is None
+
+    def start(self):
+        return self._start
+
+    def goal(self):
+        return self._goal
+
+    def is_goal(self, state):
+        if self._same_goal:
+            return self.problem.is_goal(state)
+        return state == self._goal
+
+    def successors(self, state):
+        return self.problem.successors(state)
+
+    def predecessors(self, state):
+        return self.problem.predecessors(state)
+
+    def cost(self, state, next_state):
+        return self.problem.cost(state, next_state)
+
+    def heuristic(self, state):
+        if self._same_goal:
+            return self.problem.heuristic(state)
+        return self.problem.distance(state, self._goal)
+
+
 class GridState(object):
     def __init__(self, row, col, cost):
         """ cost is cost to enter """
@@ -272,7 +890,7 @@ class GridState(object):
         return "({}, {}, {})".format(self.row, self.col, self.cost)
 
     def __hash__(self):
-        return self.row * 10000 + self.col
+        return hash((self.row, self.col))
 
     
 
@@ -283,8 +901,8 @@ class GridProblem(Problem):
         """
         self.grid_height = grid_height
         self.grid_width = grid_width
-        self.grid = [[GridState(y, x, 0.0) for x in range(grid_height)]
-                     for y in range(grid_width)]
+        self.grid = [[GridState(y, x, 0.0) for x in range(grid_width)]
+                     for y in range(grid_height)]
         for row, col in blocked_states:
             self.grid[row][col].cost = float('inf')
 
@@ -337,9 +955,19 @@ class GridProblem(Problem):
             
         return successors
 
+    def predecessors(self, state):
+        # Moves are symmetric, so the unblocked neighbors are both the
+        # successors and the predecessors.
+        return self.successors(state)
+
     def _dist(self, state1, state2):
         return (math.sqrt((state1.row - state2.row)**2 +
                           (state1.col - state2.col)**2))
+
+    def distance(self, state1, state2):
+        """ Straight line distance, a lower bound on the cost of any path
+        between the two states. """
+        return self._dist(state1, state2)
         
     
     def cost(self, state, next_state):
@@ -348,6 +976,344 @@ class GridProblem(Problem):
     def heuristic(self, state):
         return self._dist(state, self._goal)
 
+    def reverse_heuristic(self, state):
+        """ Estimated cost to reach state from the start. """
+        return self._dist(self._start, state)
+
+    def num_indices(self):
+        """ Size of a NumPy array with one entry per state_index. """
+        return self.grid_height * self.grid_width
+
+    def state_index(self, state):
+        """ Dense integer index of state, for per-state NumPy arrays. """
+        return state.row * self.grid_width + state.col
+
+    def index_state(self, index):
+        row, col = divmod(index, self.grid_width)
+        return self.grid[row][col]
+
+    def row_col(self, state):
+        return state.row, state.col
+
+    def grid_view(self, values):
+        """ (grid_height, grid_width) view of a per state_index array. """
+        return values.reshape(self.grid_height, self.grid_width)
+
+    def cost_to_go(self, goals=None):
+        """ CostToGoField for goals (a list of states, default the goal). """
+        return CostToGoField(self, [self._goal] if goals is None else goals)
+
+
+class ArrayGridProblem(Problem):
+    """
+    Grid problem backed by a NumPy array of cell costs (4 bytes per cell)
+    instead of a GridState object per cell.
+
+    States are plain integers: the flat index of a cell in a cost array
+    that is padded with a one cell border of obstacles, so successors
+    never need bounds checks.  Use state_id and row_col to convert
+    between states and (row, col) coordinates.  cell_costs is a
+    (grid_height, grid_width) view of the unpadded cells; writes to it
+    take effect immediately.
+    """
+    SQRT2 = math.sqrt(2.0)
+
+    def __init__(self, grid_width, grid_height, start, goal, blocked_states=[],
+                 costs=None):
+        """
+        blocked_states - list of (row, col) tuples
+        costs - optional (grid_height, grid_width) array of costs to
+                enter each cell
+        """
+        self.grid_height = grid_height
+        self.grid_width = grid_width
+        self.padded_width = grid_width + 2
+        self.costs = np.full((grid_height + 2, grid_width + 2), np.inf,
+                             dtype=np.float32)
+        self.cell_costs = self.costs[1:-1, 1:-1]
+        self.cell_costs[:, :] = 0.0 if costs is None else costs
+        for row, col in blocked_states:
+            self.cell_costs[row, col] = np.inf
+        # Indexing a memoryview yields Python floats, which is much
+        # faster than indexing the array itself one element at a time.
+        self._flat_costs = memoryview(self.costs.reshape(-1))
+
+        w = self.padded_width
+        self.neighbor_offsets = (-w - 1, w + 1, w - 1, -w + 1, w, -w, 1, -1)
+        self.step_lengths = (self.SQRT2,) * 4 + (1.0,) * 4
+        self._neighbors = tuple(zip(self.neighbor_offsets, self.step_lengths))
+
+        self._start = self.state_id(int(start[0] * self.grid_height),
+                                    int(start[1] * self.grid_width))
+        self._goal = self.state_id(int(goal[0] * self.grid_height),
+                                   int(goal[1] * self.grid_width))
+
+    @classmethod
+    def from_grid_problem(cls, grid_problem):
+        costs = [[state.cost for state in row] for row in grid_problem.grid]
+        problem = cls(grid_problem.grid_width, grid_problem.grid_height,
+                      (0, 0), (0, 0), costs=costs)
+        problem._start = problem.state_id(grid_problem.start().row,
+                                          grid_problem.start().col)
+        problem._goal = problem.state_id(grid_problem.goal().row,
+                                         grid_problem.goal().col)
+        return problem
+
+    def state_id(self, row, col):
+        return (row + 1) * self.padded_width + col + 1
+
+    def row_col(self, state):
+        row, col = divmod(state, self.padded_width)
+        return row - 1, col - 1
+
+    def start(self):
+        return self._start
+
+    def goal(self):
+        return self._goal
+
+    def cell_cost(self, state):
+        return self._flat_costs[state]
+
+    def set_cost(self, row, col, cost):
+        self.cell_costs[row, col] = cost
+
+    def successors(self, state):
+        costs = self._flat_costs
+        inf = float('inf')
+        return [state + offset for offset in self.neighbor_offsets
+                if costs[state + offset] != inf]
+
+    def predecessors(self, state):
+        return self.successors(state)
+
+    def expand(self, state):
+        """Fast path combining successors and cost: returns a list of
+        (next_state, step_cost) tuples.
+
+        """
+        costs = self._flat_costs
+        inf = float('inf')
+        result = []
+        for offset, length in self._neighbors:
+            cell_cost = costs[state + offset]
+            if cell_cost != inf:
+                result.append((state + offset, length + cell_cost))
+        return result
+
+    def _dist(self, state1, state2):
+        row1, col1 = divmod(state1, self.padded_width)
+        row2, col2 = divmod(state2, self.padded_width)
+        return math.sqrt((row1 - row2)**2 + (col1 - col2)**2)
+
+    def distance(self, state1, state2):
+        """ Straight line distance, a lower bound on the cost of any path
+        between the two states. """
+        return self._dist(state1, state2)
+
+    def cost(self, state, next_state):
+        return self._dist(state, next_state) + self._flat_costs[next_state]
+
+    def heuristic(self, state):
+        return self._dist(state, self._goal)
+
+    def heuristic_array(self):
+        """ heuristic for every state, as an array indexed by state. """
+        rows, cols = np.ogrid[:self.costs.shape[0], :self.costs.shape[1]]
+        goal_row, goal_col = divmod(self._goal, self.padded_width)
+        return np.hypot(rows - goal_row, cols - goal_col).reshape(-1)
+
+    def reverse_heuristic(self, state):
+        return self._dist(self._start, state)
+
+    def num_indices(self):
+        return self.costs.size
+
+    def state_index(self, state):
+        return state
+
+    def index_state(self, index):
+        return index
+
+    def grid_view(self, values):
+        return values.reshape(self.costs.shape)[1:-1, 1:-1]
+
+    def cost_to_go(self, goals=None):
+        return CostToGoField(self, [self._goal] if goals is None else goals)
+
+
+
+def distance_array(problem, sources, reverse=False):
+    """Dijkstra search from a list of source states over the whole problem.
+
+    Returns a NumPy array, indexed by problem.state_index, holding the
+    cost of the cheapest path from the nearest source to each state (or
+    from each state to its nearest source if reverse is True).
+    Unreachable states have infinite cost.
+    """
+    dist = np.full(problem.num_indices(), np.inf)
+    done = np.zeros(problem.num_indices(), dtype=bool)
+    counter = itertools.count()
+    heap = []
+    for source in sources:
+        dist[problem.state_index(source)] = 0.0
+        heap.append((0.0, next(counter), source))
+    while heap:
+        d, _, state = heapq.heappop(heap)
+        index = problem.state_index(state)
+        if done[index]:
+            continue
+        done[index] = True
+        if reverse:
+            neighbors = problem.predecessors(state)
+        else:
+            neighbors = problem.successors(state)
+        for neighbor in neighbors:
+            neighbor_index = problem.state_index(neighbor)
+            if done[neighbor_index]:
+                continue
+            if reverse:
+                new_d = d + problem.cost(neighbor, state)
+            else:
+                new_d = d + problem.cost(state, neighbor)
+            if new_d < dist[neighbor_index]:
+                dist[neighbor_index] = new_d
+                heapq.heappush(heap, (new_d, next(counter), neighbor))
+    return dist
+
+
+class CostToGoField(object):
+    """
+    Cost of the cheapest path from every state to the nearest of a set of
+    goals, computed with one backward Dijkstra pass.  Any number of agents
+    can then follow the field to a goal without searching: path(start)
+    takes O(path length) time.
+
+    costs is indexed by problem.state_index; grid() returns it as a
+    (grid_height, grid_width) array.  The field is a snapshot: build a
+    new one after changing cell costs.
+    """
+
+    def __init__(self, problem, goals):
+        self.problem = problem
+        self.goals = list(goals)
+        self.costs = distance_array(problem, self.goals, reverse=True)
+
+    def grid(self):
+        return self.problem.grid_view(self.costs)
+
+    def cost(self, state):
+        return self.costs[self.problem.state_index(state)]
+
+    def path(self, start):
+        """Follow the field downhill from start.  Returns the list of
+        states from start to a goal, or None if no goal is reachable.
+
+        """
+        problem = self.problem
+        costs = self.costs
+        if costs[problem.state_index(start)] == np.inf:
+            return None
+        path = [start]
+        state = start
+        while costs[problem.state_index(state)] != 0.0:
+            best_value = np.inf
+            for next_state in problem.successors(state):
+                value = (problem.cost(state, next_state) +
+                         costs[problem.state_index(next_state)])
+                if value < best_value:
+                    best_value = value
+                    best_state = next_state
+            state = best_state
+            path.append(state)
+        return path
+
+
+class MultiGoalProblem(Problem):
+    """
+    A grid problem (GridProblem or ArrayGridProblem) with several goals.
+    Searches stop at the first goal they reach, so one search finds the
+    nearest of many goals instead of one search per goal.
+
+    goals     - list of goal states
+    goal_test - optional function of a state: if given, only states for
+                which it returns True are goals
+
+    With goals, the heuristic is the straight line distance to the
+    nearest goal, computed for all goals at once with NumPy.  With only
+    a goal_test it is 0, so astar_search behaves like dijkstra_search.
+    There is no single goal(), so searches that need one (bidirectional
+    search, jump point search, ARA*, LPA*) do not apply.
+    """
+
+    def __init__(self, problem, goals=None, goal_test=None):
+        if goals is None and goal_test is None:
+            raise ValueError("MultiGoalProblem needs goals or a goal_test")
+        self.problem = problem
+        self.goals = None if goals is None else list(goals)
+        if self.goals is not None and not self.goals:
+            raise ValueError("MultiGoalProblem needs at least one goal "
+                             "(pass goals=None to use only a goal_test)")
+        self.goal_test = goal_test
+        self._goal_set = None
+        self._goal_rows = None
+        if goals is not None:
+            self._goal_set = set(self.goals)
+            coordinates = np.array([problem.row_col(goal)
+                                    for goal in self.goals], dtype=float)
+            self._goal_rows = coordinates[:, 0]
+            self._goal_cols = coordinates[:, 1]
+
+    def start(self):
+        return self.problem.start()
+
+    def is_goal(self, state):
+        if self._goal_set is not None and state not in self._goal_set:
+            return False
+        return self.goal_test is None or self.goal_test(state)
+
+    def successors(self, state):
+        return self.problem.successors(state)
+
+    def predecessors(self, state):
+        return self.problem.predecessors(state)
+
+    def cost(self, state, next_state):
+        return self.problem.cost(state, next_state)
+
+    def expand(self, state):
+        return self.problem.expand(state)
+
+    def heuristic(self, state):
+        if self._goal_rows is None:
+            return 0.0
+        row, col = self.problem.row_col(state)
+        return float(np.min(np.hypot(self._goal_rows - row,
+                                     self._goal_cols - col)))
+
+    def heuristic_array(self):
+        """heuristic for every state, as an array indexed by state.  Only
+        for problems whose states are integers (ArrayGridProblem).
+
+        """
+        size = self.problem.num_indices()
+        if self._goal_rows is None:
+            return np.zeros(size)
+        rows, cols = self.problem.row_col(np.arange(size))
+        result = np.full(size, np.inf)
+        for goal_row, goal_col in zip(self._goal_rows, self._goal_cols):
+            np.minimum(result, np.hypot(rows - goal_row, cols - goal_col),
+                       out=result)
+        return result
+
+    def num_indices(self):
+        return self.problem.num_indices()
+
+    def state_index(self, state):
+        return self.problem.state_index(state)
+
+    def index_state(self, index):
+        return self.problem.index_state(index)
 
 
 def generic_search_no_nodes(problem, Collection):
@@ -373,7 +1339,7 @@ def generic_search_no_nodes(problem, Collection):
 
         closed.add(cur_state)
 
-        if cur_state == problem.goal():
+        if problem.is_goal(cur_state):
             return True
         
         else:
@@ -397,6 +1363,9 @@ class Node:
     def __ne__(self, rhs):
         return not self == rhs
 
+    def __hash__(self):
+        return hash(self.state)
+
     def __repr__(self):
         if self.parent is not None:
             return "({}, {})".format(self.state, 
@@ -414,10 +1383,181 @@ def construct_path(node):
     path.reverse()
     return path
                     
-def generic_search_w_nodes(problem, Collection, vis=None):
-    
+class SearchStats(object):
+    """
+    Statistics gathered by a search.  Pass an instance as the stats
+    argument of a search and read it afterwards:
+
+    expansions    - states whose successors were generated
+    generated     - successor states generated
+    reopened      - closed states put back on the frontier (always 0 for
+                    searches that never reopen states)
+    peak_frontier - largest frontier size
+    peak_closed   - largest closed set size
+    path_cost     - cost of the path found (its number of steps for bfs
+                    and dfs), or None
+    *_time        - seconds spent in successors, cost, heuristic and
+                    frontier operations, and in the whole search
+    """
+    FIELDS = ['expansions', 'generated', 'reopened', 'peak_frontier',
+              'peak_closed', 'path_cost', 'successors_time', 'cost_time',
+              'heuristic_time', 'queue_time', 'total_time']
+
+    def __init__(self):
+        self.expansions = 0
+        self.generated = 0
+        self.reopened = 0
+        self.peak_frontier = 0
+        self.peak_closed = 0
+        self.path_cost = None
+        self.successors_time = 0.0
+        self.cost_time = 0.0
+        self.heuristic_time = 0.0
+        self.queue_time = 0.0
+        self.total_time = 0.0
+        self._start_time = None
+        self._closed = None
+
+    def instrument(self, problem, frontier, closed):
+        """Start timing and return wrappers around problem and frontier
+        that record calls into these statistics.  frontier may be None
+        for searches without one.
+
+        """
+        self._start_time = time.perf_counter()
+        self._closed = closed
+        if frontier is not None:
+            frontier = InstrumentedQueue(frontier, self)
+        return InstrumentedProblem(problem, self), frontier
+
+    def finish(self, path_cost=None):
+        """Stop timing.  Searches call this when they end; call it yourself
+        after abandoning a search part way.
+
+        """
+        if self._start_time is None:
+            return
+        self.total_time += time.perf_counter() - self._start_time
+        self.peak_closed = max(self.peak_closed, len(self._closed))
+        self.path_cost = path_cost
+        self._start_time = None
+        self._closed = None
+
+    def as_dict(self):
+        return dict((field, getattr(self, field)) for field in self.FIELDS)
+
+    def write_json(self, file_name, **labels):
+        """Append these statistics as one JSON line to file_name.  labels
+        (map name, search name...) are stored along with them.
+
+        """
+        record = dict(labels)
+        record.update(self.as_dict())
+        with open(file_name, 'a') as handle:
+            handle.write(json.dumps(record, sort_keys=True) + "\n")
+
+    def __repr__(self):
+        return "SearchStats({})".format(", ".join(
+            "{}={}".format(field, getattr(self, field))
+            for field in self.FIELDS))
+
+
+class InstrumentedProblem(object):
+    """ Wraps a problem, timing successors, cost and heuristic. """
+
+    def __init__(self, problem, stats):
+        self.problem = problem
+        self.stats = stats
+
+    def __getattr__(self, name):
+        return getattr(self.problem, name)
+
+    def successors(self, state):
+        start_time = time.perf_counter()
+        next_states = self.problem.successors(state)
+        self.stats.successors_time += time.perf_counter() - start_time
+        self.stats.expansions += 1
+        self.stats.generated += len(next_states)
+        return next_states
+
+    def cost(self, state, next_state):
+        start_time = time.perf_counter()
+        cost = self.problem.cost(state, next_state)
+        self.stats.cost_time += time.perf_counter() - start_time
+        return cost
+
+    def heuristic(self, state):
+        start_time = time.perf_counter()
+        value = self.problem.heuristic(state)
+        self.stats.heuristic_time += time.perf_counter() - start_time
+        return value
+
+    def neighbors(self, state):
+        """ Unchecked successors, for lazy searches (timed and counted
+        like successors). """
+        start_time = time.perf_counter()
+        next_states = self.problem.neighbors(state)
+        self.stats.successors_time += time.perf_counter() - start_time
+        self.stats.expansions += 1
+        self.stats.generated += len(next_states)
+        return next_states
+
+    def prefetch(self, states):
+        """ Batched successor checks (timed as successors). """
+        start_time = time.perf_counter()
+        self.problem.prefetch(states)
+        self.stats.successors_time += time.perf_counter() - start_time
+
+
+class InstrumentedQueue(object):
+    """ Wraps a frontier, timing add and pop and tracking its peak size. """
+
+    def __init__(self, frontier, stats):
+        self.frontier = frontier
+        self.stats = stats
+
+    def add(self, *args):
+        start_time = time.perf_counter()
+        changed = self.frontier.add(*args)
+        self.stats.queue_time += time.perf_counter() - start_time
+        self.stats.peak_frontier = max(self.stats.peak_frontier,
+                                       len(self.frontier))
+        return changed
+
+    def pop(self):
+        start_time = time.perf_counter()
+        item = self.frontier.pop()
+        self.stats.queue_time += time.perf_counter() - start_time
+        return item
+
+    def top_priority(self):
+        return self.frontier.top_priority()
+
+    def top(self, k):
+        return self.frontier.top(k)
+
+    def is_empty(self):
+        return self.frontier.is_empty()
+
+    def __len__(self):
+        return len(self.frontier)
+
+    def __contains__(self, item):
+        return item in self.frontier
+
+    def __iter__(self):
+        return iter(self.frontier)
+
+
+def generic_search_events(problem, Collection, stats=None):
+    """Generator version of generic_search_w_nodes.  Yields a SearchEvent
+    after every expansion.
+
+    """
     frontier = Collection()
     closed = set()
+    if stats is not None:
+        problem, frontier = stats.instrument(problem, frontier, closed)
 
     frontier.add(Node(problem.start(), None))    
 
@@ -426,19 +1566,28 @@ def generic_search_w_nodes(problem, Collection, vis=None):
         cur_state = cur_node.state
         closed.add(cur_state)
 
-        if cur_state == problem.goal():
+        if problem.is_goal(cur_state):
             path = construct_path(cur_node) # path ending at this node
-            vis.draw(closed, frontier, path, True)
-            return path
+            if stats is not None:
+                stats.finish(len(path) - 1)
+            yield SearchEvent(cur_state, [], path)
+            return
         
         else:
+            added = []
             for next_state in problem.successors(cur_state):
                 next_node = Node(next_state, cur_node)
                 if (next_state not in closed and
                         next_node not in frontier):
                     frontier.add(next_node)
-            vis.draw(closed, frontier, None, False)
+                    added.append(next_state)
+            yield SearchEvent(cur_state, added, None)
+    if stats is not None:
+        stats.finish()
+
 
+def generic_search_w_nodes(problem, Collection, vis=None, stats=None):
+    return run_search(generic_search_events(problem, Collection, stats), vis)
 
 
 class CostNode:
@@ -460,6 +1609,9 @@ class CostNode:
     def __ne__(self, rhs):
         return not self == rhs
 
+    def __hash__(self):
+        return hash(self.state)
+
     def __repr__(self):
         if self.parent is not None:
             return "({}, {}, {})".format(self.state, 
@@ -470,9 +1622,12 @@ class CostNode:
                                          self.path_cost)
 
 
-def dijkstra_search(problem, vis=None):
-    frontier = PriorityQueue()
+def dijkstra_events(problem, Collection=IndexedPriorityQueue, stats=None):
+    """ Generator version of dijkstra_search. """
+    frontier = Collection()
     closed = set()
+    if stats is not None:
+        problem, frontier = stats.instrument(problem, frontier, closed)
 
     start_node = CostNode(problem.start(), None, 0.0)
     frontier.add(start_node, 0)
@@ -482,26 +1637,33 @@ def dijkstra_search(problem, vis=None):
         cur_state = cur_node.state
         closed.add(cur_state)
 
-        if cur_state == problem.goal():
+        if problem.is_goal(cur_state):
             path =  construct_path(cur_node)
-            print(cur_node.path_cost)
-            vis.draw(closed, frontier, path, True)
-            return construct_path(cur_node)
+            if stats is not None:
+                stats.finish(cur_node.path_cost)
+            yield SearchEvent(cur_state, [], path)
+            return
          
         else:
+            added = []
             successors = problem.successors(cur_state)
             for next_state in successors:
                 cost = problem.cost(cur_state, next_state)
                 next_node = CostNode(next_state, cur_node, cost)
-                if next_state not in closed:
-                    frontier.add(next_node, next_node.path_cost)
-            vis.draw(closed, frontier, None, False)
-    return None
+                if (next_state not in closed and
+                        frontier.add(next_node, next_node.path_cost)):
+                    added.append(next_state)
+            yield SearchEvent(cur_state, added, None)
+    if stats is not None:
+        stats.finish()
 
 
-def astar_search(problem, vis=None):
-    frontier = PriorityQueue()
+def astar_events(problem, Collection=IndexedPriorityQueue, stats=None):
+    """ Generator version of astar_search. """
+    frontier = Collection()
     closed = set()
+    if stats is not None:
+        problem, frontier = stats.instrument(problem, frontier, closed)
 
     start_node = CostNode(problem.start(), None, 0.0)
     frontier.add(start_node, 0)
@@ -511,25 +1673,131 @@ def astar_search(problem, vis=None):
         cur_state = cur_node.state
         closed.add(cur_state)
 
-        if cur_state == problem.goal():
+        if problem.is_goal(cur_state):
             path =  construct_path(cur_node)
-            print(cur_node.path_cost)
-            vis.draw(closed, frontier, path, True)
-            return construct_path(cur_node)
+            if stats is not None:
+                stats.finish(cur_node.path_cost)
+            yield SearchEvent(cur_state, [], path)
+            return
          
         else:
+            added = []
             successors = problem.successors(cur_state)
             for next_state in successors:
                 cost = problem.cost(cur_state, next_state)
                 next_node = CostNode(next_state, cur_node, cost)
                 if next_state not in closed:
                     f = next_node.path_cost + problem.heuristic(next_state)
-                    frontier.add(next_node, f)
-            vis.draw(closed, frontier, None, False)
-    return None
+                    if frontier.add(next_node, f):
+                        added.append(next_state)
+            yield SearchEvent(cur_state, added, None)
+    if stats is not None:
+        stats.finish()
+
 
+def dijkstra_search(problem, vis=None, Collection=IndexedPriorityQueue,
+                    stats=None):
+    return run_search(dijkstra_events(problem, Collection, stats), vis)
 
-def load_grid_problem(file_name):
+
+def astar_search(problem, vis=None, Collection=IndexedPriorityQueue,
+                 stats=None):
+    return run_search(astar_events(problem, Collection, stats), vis)
+
+
+def array_search(problem, use_heuristic=True, stats=None):
+    """Dijkstra (or A* if use_heuristic) without any per-state objects.
+
+    The problem's states must be the integers 0 .. num_indices() - 1, and
+    it must provide expand (see ArrayGridProblem).  g-values, parent
+    states and closed flags live in preallocated NumPy arrays, which are
+    read and written through memoryviews because indexing those is much
+    faster than indexing the arrays one element at a time.  The heap
+    holds (f, state) tuples; stale entries are skipped when popped.  If
+    the problem has a heuristic_array method, the heuristic is computed
+    for every state in one vectorized step.
+
+    stats, if given, gets the counts and total_time but no time
+    breakdown, since timing individual calls would cost more than the
+    calls themselves.
+    """
+    start_time = time.perf_counter()
+    size = problem.num_indices()
+    g_array = np.full(size, np.inf)
+    parent_array = np.full(size, -1, dtype=np.int64)
+    closed_array = np.zeros(size, dtype=np.uint8)
+    g = memoryview(g_array)
+    parent = memoryview(parent_array)
+    closed = memoryview(closed_array)
+    if not use_heuristic:
+        h = None
+    elif hasattr(problem, 'heuristic_array'):
+        h = memoryview(problem.heuristic_array())
+    else:
+        h = None
+        heuristic = problem.heuristic
+
+    start = problem.start()
+    is_goal = problem.is_goal
+    expand = problem.expand
+    heappush = heapq.heappush
+    heappop = heapq.heappop
+    g[start] = 0.0
+    heap = [(0.0, start)]
+    expansions = generated = peak_frontier = 0
+    found = False
+    while heap:
+        _, state = heappop(heap)
+        if closed[state]:
+            continue
+        if is_goal(state):
+            goal = state
+            found = True
+            break
+        closed[state] = 1
+        expansions += 1
+        g_state = g[state]
+        for next_state, step_cost in expand(state):
+            generated += 1
+            new_g = g_state + step_cost
+            if new_g < g[next_state]:
+                g[next_state] = new_g
+                parent[next_state] = state
+                if not use_heuristic:
+                    heappush(heap, (new_g, next_state))
+                elif h is not None:
+                    heappush(heap, (new_g + h[next_state], next_state))
+                else:
+                    heappush(heap, (new_g + heuristic(next_state),
+                                    next_state))
+        if len(heap) > peak_frontier:
+            peak_frontier = len(heap)
+
+    path = None
+    if found:
+        path = [goal]
+        while path[-1] != start:
+            path.append(parent[path[-1]])
+        path.reverse()
+    if stats is not None:
+        stats.expansions += expansions
+        stats.generated += generated
+        stats.peak_frontier = max(stats.peak_frontier, peak_frontier)
+        stats.peak_closed = max(stats.peak_closed, expansions)
+        stats.path_cost = g[goal] if found else None
+        stats.total_time += time.perf_counter() - start_time
+    return path
+
+
+def array_dijkstra_search(problem, stats=None):
+    return array_search(problem, False, stats)
+
+
+def array_astar_search(problem, stats=None):
+    return array_search(problem, True, stats)
+
+
+def load_grid_problem(file_name, problem_class=GridProblem):
     fh = open(file_name, 'r')
     lines = fh.readlines()
     rows = int(lines[0].split()[1])
@@ -538,15 +1806,17 @@ def load_grid_problem(file_name):
     for line in lines[1::]:
         s = line.split()
         blocked.append((int(s[1]), int(s[0])))
-    return GridProblem(cols, rows, (.3, .2), (.66, .75), blocked)
+    return problem_class(cols, rows, (.3, .2), (.66, .75), blocked)
 
-bfs = lambda prob, vis: generic_search_w_nodes(prob, Queue, vis)
-dfs = lambda prob, vis: generic_search_w_nodes(prob, Stack, vis)
+bfs = lambda prob, vis=None, stats=None: generic_search_w_nodes(
+    prob, Queue, vis, stats)
+dfs = lambda prob, vis=None, stats=None: generic_search_w_nodes(
+    prob, Stack, vis, stats)
 
 def create_gif(search_alg, file_name):
     p = load_grid_problem('filled_grid_cells.dat')
     v = GridVisualizer(p, search_alg, grid_square_size=5, fill=True,
-                       save_prefix="tmp")
+                       save_prefix="tmp", frame_rate=None)
     print("Generating gif...")
     subprocess.call(["convert", "-loop", "1", "-delay", "4",
                      "{}/*.png".format(v.tmp_dir), file_name])
@@ -560,33 +1830,41 @@ def main():
                         action="store_true")
     parser.add_argument("--gifs", help="generate gifs",
                         action="store_true")
+    parser.add_argument("--benchmark", help="run the headless benchmark "
+                        "suite and print a CSV table (see search_benchmark)",
+                        action="store_true")
+    parser.add_argument("--queue", default='indexed',
+                        choices=sorted(PRIORITY_QUEUES.keys()),
+                        help="priority queue for dijkstra and astar")
     args = parser.parse_args()
+    if args.benchmark:
+        import search_benchmark
+        search_benchmark.suite_benchmark([64, 128, 256], [.1, .25, .4],
+                                         seed=0, max_expansions=50000)
+        return
+    queue = PRIORITY_QUEUES[args.queue]
+    astar = lambda prob, vis: astar_search(prob, vis, queue)
+    dijkstra = lambda prob, vis: dijkstra_search(prob, vis, queue)
     
     p = load_grid_problem('filled_grid_cells.dat')
  
 
     if args.figs:
         print("Generating .dat files to be processed by c_asy.asy")
-        v = AsymptoteVisualizer(p, "dat/astar{:04d}.dat",
-                                which_iterations=[1, 2, 13, 100, 350])
-        astar_search(p, v)
-        
-        v = AsymptoteVisualizer(p, "dat/dijkstra{:04d}.dat",
-                                which_iterations=[1, 2, 13, 100, 350])
-        dijkstra_search(p, v)
-        
-        v = AsymptoteVisualizer(p, "dat/bfs{:04d}.dat",
-                                which_iterations=[1, 2, 9, 81, 350])
-        bfs(p, v)
-        
-        v = AsymptoteVisualizer(p, "dat/dfs{:04d}.dat",
-                                which_iterations=[1, 2, 9, 81, 350])
-        dfs(p, v)
+        for name, search, which in [
+                ('astar', astar, [1, 2, 13, 100, 350]),
+                ('dijkstra', dijkstra, [1, 2, 13, 100, 350]),
+                ('bfs', bfs, [1, 2, 9, 81, 350]),
+                ('dfs', dfs, [1, 2, 9, 81, 350])]:
+            trace_file = "dat/{}.trace".format(name)
+            search(p, AsymptoteVisualizer(p, trace_file))
+            SearchTrace(trace_file).write_dats("dat/" + name + "{:04d}.dat",
+                                               which)
     elif args.gifs:
         create_gif(dfs, 'dfs.gif')
         create_gif(bfs, 'bfs.gif')
-        create_gif(astar_search, 'astar.gif')
-        create_gif(dijkstra_search, 'dijkstra.gif')
+        create_gif(astar, 'astar.gif')
+        create_gif(dijkstra, 'dijkstra.gif')
         
     else:
         while True:
@@ -596,9 +1874,9 @@ def main():
             elif which == 'b':
                 GridVisualizer(p, bfs)
             elif which == 'a':
-                GridVisualizer(p, astar_search)
+                GridVisualizer(p, astar)
             elif which == 'j':
-                GridVisualizer(p, dijkstra_search)
+                GridVisualizer(p, dijkstra)
     
 if __name__ == "__main__":
     main()
@@ -0,0 +1,305 @@
+""" Hierarchical path-finding A* (HPA*) for large GridProblems.
+
+The grid is split into square clusters.  Wherever two neighboring
+clusters share a run of free cells along their border, one or two
+transitions (pairs of cells facing each other across the border) are
+added to an abstract graph.  Within each cluster the cheapest paths
+between all of its transition cells are precomputed.  A query connects
+the start and goal to the transition cells of their clusters, runs A*
+on the small abstract graph, and then splices together the stored
+paths.
+
+The resulting paths are usually within a few percent of optimal.  When
+cell costs change only the clusters containing those cells, and the
+neighbors sharing a border with them, are rebuilt.
+
+Reference: Botea, Mueller and Schaeffer, "Near Optimal Hierarchical
+Path-Finding", Journal of Game Development 1 (2004).
+"""
+import heapq
+import itertools
+
+import book_search
+
+INF = float('inf')
+
+
+class AbstractProblem(book_search.Problem):
+    """The abstract graph of an HPAStar planner with a start and goal
+    attached.  Its states are grid states and each edge remembers the grid
+    path it stands for.
+
+    """
+
+    def __init__(self, planner, start, goal, start_edges, goal_edges):
+        self.planner = planner
+        self._start = start
+        self._goal = goal
+        self.start_edges = start_edges
+        self.goal_edges = goal_edges
+
+    def start(self):
+        return self._start
+
+    def goal(self):
+        return self._goal
+
+    def edges(self, state):
+        """ Dictionary mapping next_state to (cost, grid path). """
+        if state == self._start:
+            edges = dict(self.start_edges)
+        else:
+            edges = dict(self.planner.edges(state))
+        if state in self.goal_edges:
+            edges[self._goal] = self.goal_edges[state]
+        return edges
+
+    def successors(self, state):
+        return list(self.edges(state).keys())
+
+    def cost(self, state, next_state):
+        return self.edges(state)[next_state][0]
+
+    def heuristic(self, state):
+        return self.planner.problem.distance(state, self._goal)
+
+
+class HPAStar(object):
+    """Hierarchical planner for a GridProblem.
+
+    After changing grid[row][col].cost for some cells, call cells_changed
+    with those states before the next call to plan.  abstract_expansions
+    holds the number of abstract states expanded by the last query.
+    """
+
+    MAX_ENTRANCE_WIDTH = 6
+
+    def __init__(self, problem, cluster_size=10):
+        self.problem = problem
+        self.cluster_size = cluster_size
+        self.cluster_rows = -(-problem.grid_height // cluster_size)
+        self.cluster_cols = -(-problem.grid_width // cluster_size)
+        self.transitions = {}   # border -> list of (state, state) pairs
+        self.inter = {}         # state -> {state across border: cost}
+        self.intra = {}         # cluster -> {state: {state: (cost, path)}}
+        self.abstract_expansions = 0
+
+        for border in self._all_borders():
+            self._build_border(border)
+        for cluster in itertools.product(range(self.cluster_rows),
+                                         range(self.cluster_cols)):
+            self._build_cluster(cluster)
+
+    # ---------------------------------------------------------------
+    # Clusters and borders
+    # ---------------------------------------------------------------
+    def cluster_of(self, state):
+        return (state.row // self.cluster_size, state.col // self.cluster_size)
+
+    def _bounds(self, cluster):
+        """ (row_min, row_max, col_min, col_max), max exclusive. """
+        size = self.cluster_size
+        return (cluster[0] * size,
+                min((cluster[0] + 1) * size, self.problem.grid_height),
+                cluster[1] * size,
+                min((cluster[1] + 1) * size, self.problem.grid_width))
+
+    def _all_borders(self):
+        """Borders are identified by the cluster above or to the left and
+        the direction, 'v' (vertical border) or 'h' (horizontal border).
+
+        """
+        for ci in range(self.cluster_rows):
+            for cj in range(self.cluster_cols):
+                if cj + 1 < self.cluster_cols:
+                    yield (ci, cj, 'v')
+                if ci + 1 < self.cluster_rows:
+                    yield (ci, cj, 'h')
+
+    def _cluster_borders(self, cluster):
+        ci, cj = cluster
+        borders = []
+        if cj + 1 < self.cluster_cols:
+            borders.append((ci, cj, 'v'))
+        if cj > 0:
+            borders.append((ci, cj - 1, 'v'))
+        if ci + 1 < self.cluster_rows:
+            borders.append((ci, cj, 'h'))
+        if ci > 0:
+            borders.append((ci - 1, cj, 'h'))
+        return borders
+
+    def _border_cells(self, border):
+        """ List of facing (state, state) pairs along the border. """
+        ci, cj, direction = border
+        row_min, row_max, col_min, col_max = self._bounds((ci, cj))
+        grid = self.problem.grid
+        if direction == 'v':
+            return [(grid[row][col_max - 1], grid[row][col_max])
+                    for row in range(row_min, row_max)]
+        return [(grid[row_max - 1][col], grid[row_max][col])
+                for col in range(col_min, col_max)]
+
+    def _build_border(self, border):
+        for state, other in self.transitions.get(border, []):
+            self.inter[state].pop(other, None)
+            self.inter[other].pop(state, None)
+
+        transitions = []
+        run = []
+        for pair in self._border_cells(border) + [None]:
+            if (pair is not None and pair[0].cost != INF and
+                    pair[1].cost != INF):
+                run.append(pair)
+                continue
+            if len(run) >= self.MAX_ENTRANCE_WIDTH:
+                transitions.extend([run[0], run[-1]])
+            elif run:
+                transitions.append(run[len(run) // 2])
+            run = []
+        self.transitions[border] = transitions
+
+        problem = self.problem
+        for state, other in transitions:
+            self.inter.setdefault(state, {})[other] = problem.cost(state,
+                                                                   other)
+            self.inter.setdefault(other, {})[state] = problem.cost(other,
+                                                                   state)
+
+    def _cluster_nodes(self, cluster):
+        nodes = set()
+        for border in self._cluster_borders(cluster):
+            for pair in self.transitions[border]:
+                for state in pair:
+                    if self.cluster_of(state) == cluster:
+                        nodes.add(state)
+        return nodes
+
+    def _cluster_search(self, source, cluster, reverse=False):
+        """Dijkstra search from source that stays inside cluster.  Returns
+        a dictionary mapping each reached state to (cost, path), where
+        path leads from source (or to source if reverse is True).
+
+        """
+        problem = self.problem
+        row_min, row_max, col_min, col_max = self._bounds(cluster)
+        counter = itertools.count()
+        heap = [(0.0, next(counter), source, None)]
+        parents = {}
+        costs = {}
+        while heap:
+            cost, _, state, parent = heapq.heappop(heap)
+            if state in costs:
+                continue
+            costs[state] = cost
+            parents[state] = parent
+            if reverse:
+                neighbors = problem.predecessors(state)
+            else:
+                neighbors = problem.successors(state)
+            for neighbor in neighbors:
+                if (neighbor in costs or
+                        not row_min <= neighbor.row < row_max or
+                        not col_min <= neighbor.col < col_max):
+                    continue
+                if reverse:
+                    step = problem.cost(neighbor, state)
+                else:
+                    step = problem.cost(state, neighbor)
+                heapq.heappush(heap, (cost + step, next(counter), neighbor,
+                                      state))
+
+        result = {}
+        for state in costs:
+            path = [state]
+            while parents[path[-1]] is not None:
+                path.append(parents[path[-1]])
+            if not reverse:
+                path.reverse()
+            result[state] = (costs[state], path)
+        return result
+
+    def _build_cluster(self, cluster):
+        nodes = self._cluster_nodes(cluster)
+        edges = {}
+        for node in nodes:
+            if node.cost == INF:
+                continue
+            reached = self._cluster_search(node, cluster)
+            edges[node] = dict((other, reached[other]) for other in nodes
+                               if other != node and other in reached)
+        self.intra[cluster] = edges
+
+    def edges(self, state):
+        """ Abstract edges leaving state: next_state -> (cost, path). """
+        edges = dict(self.intra[self.cluster_of(state)].get(state, {}))
+        for other, cost in self.inter.get(state, {}).items():
+            edges[other] = (cost, [state, other])
+        return edges
+
+    def num_abstract_nodes(self):
+        return sum(len(edges) for edges in self.intra.values())
+
+    # ---------------------------------------------------------------
+    # Updates and queries
+    # ---------------------------------------------------------------
+    def cells_changed(self, states):
+        """ Rebuild the parts of the abstract graph affected by states. """
+        borders = set()
+        for state in states:
+            for border in self._cluster_borders(self.cluster_of(state)):
+                if state in [cell for pair in self._border_cells(border)
+                             for cell in pair]:
+                    borders.add(border)
+        clusters = set(self.cluster_of(state) for state in states)
+        for border in borders:
+            self._build_border(border)
+            ci, cj, direction = border
+            clusters.add((ci, cj))
+            clusters.add((ci, cj + 1) if direction == 'v' else (ci + 1, cj))
+        for cluster in clusters:
+            self._build_cluster(cluster)
+
+    def plan(self, start=None, goal=None):
+        """Return a list of grid states from start to goal (by default
+        those of the problem), or None if there is no path.
+
+        """
+        problem = self.problem
+        start = problem.start() if start is None else start
+        goal = problem.goal() if goal is None else goal
+        if start.cost == INF or goal.cost == INF:
+            return None
+
+        start_cluster = self.cluster_of(start)
+        goal_cluster = self.cluster_of(goal)
+        from_start = self._cluster_search(start, start_cluster)
+        to_goal = self._cluster_search(goal, goal_cluster, reverse=True)
+        start_nodes = self._cluster_nodes(start_cluster)
+        goal_nodes = self._cluster_nodes(goal_cluster)
+
+        start_edges = dict((node, from_start[node]) for node in start_nodes
+                           if node in from_start and node != start)
+        for other, cost in self.inter.get(start, {}).items():
+            start_edges[other] = (cost, [start, other])
+        if start in self.intra[start_cluster]:
+            start_edges.update(self.intra[start_cluster][start])
+        if goal in from_start:
+            start_edges[goal] = from_start[goal]
+        goal_edges = dict((node, to_goal[node]) for node in goal_nodes
+                          if node in to_goal and node != goal)
+
+        abstract = AbstractProblem(self, start, goal, start_edges, goal_edges)
+        stats = book_search.SearchStats()
+        abstract_path = book_search.astar_search(abstract, stats=stats)
+        self.abstract_expansions = stats.expansions
+        if abstract_path is None:
+            # Transitions only cover straight border crossings, so fall
+            # back to a flat search before reporting that no path exists.
+            return book_search.astar_search(
+                book_search.QueryProblem(problem, start, goal))
+
+        path = [start]
+        for state, next_state in zip(abstract_path, abstract_path[1:]):
+            path.extend(abstract.edges(state)[next_state][1][1:])
+        return path
@@ -0,0 +1,149 @@
+""" Lifelong Planning A* (LPA*) for grid problems whose cell costs change.
+
+LPA* keeps the g-values and one-step lookahead (rhs) values of the
+previous search.  When the cost of some cells changes, only the states
+whose values become inconsistent are put back on the queue, so
+replanning after a small map edit usually expands a tiny fraction of
+the states that a fresh A* search would.
+
+Reference: Koenig, Likhachev and Furcy, "Lifelong Planning A*",
+Artificial Intelligence 155 (2004).
+
+Run this file to paint obstacles (left mouse) and expensive cells
+(right mouse) while the path is repaired after every edit.
+"""
+import book_search
+
+INF = float('inf')
+
+# Keys whose first components differ by less than this are treated as
+# tied, so that floating point error cannot hide an inconsistent state
+# behind the lexicographic tie-break on the second component.
+KEY_TOLERANCE = 1e-9
+
+
+def key_less(key1, key2):
+    if key1[0] < key2[0] - KEY_TOLERANCE:
+        return True
+    if key1[0] > key2[0] + KEY_TOLERANCE:
+        return False
+    return key1[1] < key2[1] - KEY_TOLERANCE
+
+
+class LPAStar(object):
+    """Incremental A* for a problem with a fixed start and goal.
+
+    The problem must provide start, goal, successors, cost and heuristic
+    (as GridProblem does).  Predecessors are taken to be the successors,
+    which holds for undirected grids.  After changing the cost of one or
+    more states, call cells_changed with those states and then plan.
+
+    After each call to plan, expansions holds the number of states
+    expanded by that call; total_expansions accumulates over calls.
+    """
+
+    def __init__(self, problem):
+        self.problem = problem
+        self.g = {}
+        self.rhs = {}
+        self.queue = book_search.IndexedPriorityQueue()
+        self.expansions = 0
+        self.total_expansions = 0
+        start = problem.start()
+        self.rhs[start] = 0.0
+        self.queue.add(start, self._key(start))
+
+    def _key(self, state):
+        value = min(self.g.get(state, INF), self.rhs.get(state, INF))
+        return (value + self.problem.heuristic(state), value)
+
+    def _update_vertex(self, state):
+        problem = self.problem
+        if state != problem.start():
+            rhs = INF
+            for pred in problem.successors(state):
+                value = self.g.get(pred, INF) + problem.cost(pred, state)
+                if value < rhs:
+                    rhs = value
+            self.rhs[state] = rhs
+        if self.g.get(state, INF) != self.rhs.get(state, INF):
+            self.queue.update(state, self._key(state))
+        elif state in self.queue:
+            self.queue.remove(state)
+
+    def cells_changed(self, states):
+        """ Tell the planner that the costs of states have changed. """
+        for state in states:
+            self._update_vertex(state)
+            for neighbor in self.problem.successors(state):
+                self._update_vertex(neighbor)
+
+    def _compute_shortest_path(self):
+        problem = self.problem
+        goal = problem.goal()
+        queue = self.queue
+        g = self.g
+        rhs = self.rhs
+        while (not queue.is_empty() and
+               (key_less(queue.top_priority(), self._key(goal)) or
+                rhs.get(goal, INF) != g.get(goal, INF))):
+            state = queue.pop()
+            self.expansions += 1
+            if g.get(state, INF) > rhs.get(state, INF):
+                g[state] = rhs[state]
+                for next_state in problem.successors(state):
+                    value = g[state] + problem.cost(state, next_state)
+                    if value < rhs.get(next_state, INF):
+                        rhs[next_state] = value
+                        queue.update(next_state, self._key(next_state))
+            else:
+                g[state] = INF
+                self._update_vertex(state)
+                for next_state in problem.successors(state):
+                    self._update_vertex(next_state)
+
+    def path_cost(self):
+        return self.g.get(self.problem.goal(), INF)
+
+    def plan(self):
+        """Bring the search up to date and return a list of states from
+        start to goal, or None if the goal is unreachable.
+
+        """
+        self.expansions = 0
+        self._compute_shortest_path()
+        self.total_expansions += self.expansions
+        return self._extract_path()
+
+    def _extract_path(self):
+        problem = self.problem
+        state = problem.goal()
+        if self.g.get(state, INF) == INF:
+            return None
+        path = [state]
+        while state != problem.start():
+            state = min(problem.successors(state),
+                        key=lambda pred: (self.g.get(pred, INF) +
+                                          problem.cost(pred, state)))
+            path.append(state)
+        path.reverse()
+        return path
+
+    def full_search_expansions(self):
+        """Number of expansions a search from scratch needs on the current
+        map, for comparison with the expansions of the last plan call.
+
+        """
+        fresh = LPAStar(self.problem)
+        fresh.plan()
+        return fresh.expansions
+
+
+def main():
+    p = book_search.load_grid_problem('filled_grid_cells.dat')
+    book_search.GridVisualizer(p, book_search.astar_search,
+                               replanner=LPAStar(p))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,185 @@
+""" Jump Point Search (JPS) for uniform-cost, 8-connected GridProblems.
+
+On an open grid there are many symmetric optimal paths, and A* expands
+nearly all of them.  JPS only expands "jump points": cells where an
+optimal path may have to change direction because an obstacle creates a
+forced neighbor.  The moves between jump points are straight or
+diagonal runs, so the path costs are the same as for astar_search.
+
+GridProblem allows diagonal moves past the corners of obstacles, so the
+pruning rules here are the ones from the original paper, which make the
+same assumption.
+
+Reference: Harabor and Grastien, "Online Graph Pruning for Pathfinding
+on Grid Maps", AAAI 2011.
+"""
+import book_search
+
+INF = float('inf')
+
+DIRECTIONS = [(-1, -1), (1, 1), (1, -1), (-1, 1),
+              (1, 0), (-1, 0), (0, 1), (0, -1)]
+
+
+def _sign(x):
+    return (x > 0) - (x < 0)
+
+
+def is_uniform(problem):
+    """ True if every cell of the GridProblem is either free or blocked. """
+    for row in problem.grid:
+        for state in row:
+            if state.cost != 0.0 and state.cost != INF:
+                return False
+    return True
+
+
+class JumpPointSearch(object):
+    """A* over jump points.  After search returns, expansions holds the
+    number of jump points expanded.
+
+    """
+
+    def __init__(self, problem):
+        self.problem = problem
+        self.grid = problem.grid
+        self.expansions = 0
+
+    def _free(self, row, col):
+        return (0 <= row < self.problem.grid_height and
+                0 <= col < self.problem.grid_width and
+                self.grid[row][col].cost != INF)
+
+    def _directions(self, state, parent):
+        """ Directions that survive pruning when arriving from parent. """
+        if parent is None:
+            return DIRECTIONS
+        row, col = state.row, state.col
+        dr = _sign(row - parent.row)
+        dc = _sign(col - parent.col)
+        free = self._free
+        if dr and dc:
+            dirs = [(dr, 0), (0, dc), (dr, dc)]
+            if not free(row - dr, col):
+                dirs.append((-dr, dc))
+            if not free(row, col - dc):
+                dirs.append((dr, -dc))
+        elif dr:
+            dirs = [(dr, 0)]
+            if not free(row, col + 1):
+                dirs.append((dr, 1))
+            if not free(row, col - 1):
+                dirs.append((dr, -1))
+        else:
+            dirs = [(0, dc)]
+            if not free(row + 1, col):
+                dirs.append((1, dc))
+            if not free(row - 1, col):
+                dirs.append((-1, dc))
+        return dirs
+
+    def _jump(self, row, col, dr, dc):
+        """Step from (row, col) in direction (dr, dc) until reaching a jump
+        point.  Returns its (row, col), or None if there is none.
+
+        """
+        free = self._free
+        goal = self.problem.goal()
+        while True:
+            row += dr
+            col += dc
+            if not free(row, col):
+                return None
+            if row == goal.row and col == goal.col:
+                return row, col
+            if dr and dc:
+                if ((not free(row - dr, col) and
+                     free(row - dr, col + dc)) or
+                        (not free(row, col - dc) and
+                         free(row + dr, col - dc))):
+                    return row, col
+                if (self._jump(row, col, dr, 0) is not None or
+                        self._jump(row, col, 0, dc) is not None):
+                    return row, col
+            elif dr:
+                if ((not free(row, col + 1) and free(row + dr, col + 1)) or
+                        (not free(row, col - 1) and free(row + dr, col - 1))):
+                    return row, col
+            else:
+                if ((not free(row + 1, col) and free(row + 1, col + dc)) or
+                        (not free(row - 1, col) and free(row - 1, col + dc))):
+                    return row, col
+
+    def _fill_path(self, jump_points):
+        """ Expand a list of jump points into the full list of cells. """
+        path = [jump_points[0]]
+        for state in jump_points[1:]:
+            prev = path[-1]
+            dr = _sign(state.row - prev.row)
+            dc = _sign(state.col - prev.col)
+            row, col = prev.row, prev.col
+            while (row, col) != (state.row, state.col):
+                row += dr
+                col += dc
+                path.append(self.grid[row][col])
+        return path
+
+    def events(self):
+        """ Generator of book_search.SearchEvents, one per jump point. """
+        problem = self.problem
+        frontier = book_search.IndexedPriorityQueue()
+        closed = set()
+        self.expansions = 0
+
+        start_node = book_search.CostNode(problem.start(), None, 0.0)
+        frontier.add(start_node, 0)
+
+        while not frontier.is_empty():
+            cur_node = frontier.pop()
+            cur_state = cur_node.state
+            closed.add(cur_state)
+            self.expansions += 1
+
+            if cur_state == problem.goal():
+                path = self._fill_path(book_search.construct_path(cur_node))
+                yield book_search.SearchEvent(cur_state, [], path)
+                return
+
+            added = []
+            parent = cur_node.parent
+            parent_state = parent.state if parent is not None else None
+            for dr, dc in self._directions(cur_state, parent_state):
+                jump_point = self._jump(cur_state.row, cur_state.col, dr, dc)
+                if jump_point is None:
+                    continue
+                next_state = self.grid[jump_point[0]][jump_point[1]]
+                if next_state in closed:
+                    continue
+                cost = problem.cost(cur_state, next_state)
+                next_node = book_search.CostNode(next_state, cur_node, cost)
+                f = next_node.path_cost + problem.heuristic(next_state)
+                frontier.add(next_node, f)
+                added.append(next_state)
+            yield book_search.SearchEvent(cur_state, added, None)
+
+    def search(self, vis=None):
+        return book_search.run_search(self.events(), vis)
+
+
+def jps_search(problem, vis=None):
+    """Jump point search on a GridProblem.  Falls back to astar_search if
+    any cell has a cost other than 0 (free) or infinity (blocked).
+
+    """
+    if not is_uniform(problem):
+        return book_search.astar_search(problem, vis)
+    return JumpPointSearch(problem).search(vis)
+
+
+def main():
+    p = book_search.load_grid_problem('filled_grid_cells.dat')
+    book_search.GridVisualizer(p, jps_search)
+
+
+if __name__ == "__main__":
+    main()
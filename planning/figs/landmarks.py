@@ -0,0 +1,137 @@
+""" ALT (A*, Landmarks, Triangle inequality) heuristics for grid problems.
+
+A handful of landmark states are chosen and a full Dijkstra search is run
+from and to each of them.  For any landmark L the triangle inequality
+gives two lower bounds on the cost from s to the goal t:
+
+    d(s, t) >= d(L, t) - d(L, s)
+    d(s, t) >= d(s, L) - d(t, L)
+
+The heuristic is the largest of these bounds (and of the problem's own
+heuristic).  Unlike straight line distance it accounts for obstacles, so
+A* expands far fewer states.  Building the tables is expensive, but they
+can be saved to disk and reused for any number of start/goal queries on
+the same map.
+
+Reference: Goldberg and Harrelson, "Computing the Shortest Path: A*
+Search Meets Graph Theory", SODA 2005.
+
+The problem must provide predecessors, num_indices, state_index and
+index_state (see GridProblem and ArrayGridProblem).
+"""
+import argparse
+
+import numpy as np
+
+import book_search
+
+
+class LandmarkTables(object):
+    """Distance tables for a set of landmarks.
+
+    from_landmarks[i, k] is the cost from landmark k to the state with
+    index i, to_landmarks[i, k] the cost from that state to landmark k.
+    Rows are per state so the heuristic reads two contiguous rows.  The
+    tables are float32, half the size of float64 ones; rounding_error is
+    the most the difference of two rounded entries can be off by.
+    """
+
+    def __init__(self, landmark_indices, from_landmarks, to_landmarks):
+        self.landmark_indices = np.asarray(landmark_indices)
+        self.from_landmarks = np.asarray(from_landmarks, dtype=np.float32)
+        self.to_landmarks = np.asarray(to_landmarks, dtype=np.float32)
+        largest = max(np.max(table[np.isfinite(table)], initial=0.0)
+                      for table in [self.from_landmarks, self.to_landmarks])
+        # Each entry is rounded by half an eps of the largest one, and so
+        # is the difference of two entries.
+        self.rounding_error = float(2 * np.finfo(np.float32).eps * largest)
+
+    @classmethod
+    def build(cls, problem, num_landmarks=8):
+        """Choose landmarks by farthest point selection, starting from the
+        state farthest from the problem's start, and compute their tables.
+
+        """
+        first = int(np.argmax(_finite(book_search.distance_array(
+            problem, [problem.start()]))))
+        indices = [first]
+        from_columns = []
+        to_columns = []
+        min_dist = None
+        while True:
+            landmark = problem.index_state(indices[-1])
+            from_columns.append(
+                book_search.distance_array(problem, [landmark]))
+            to_columns.append(
+                book_search.distance_array(problem, [landmark], reverse=True))
+            if len(indices) == num_landmarks:
+                break
+            if min_dist is None:
+                min_dist = _finite(from_columns[-1])
+            else:
+                min_dist = np.minimum(min_dist, _finite(from_columns[-1]))
+            indices.append(int(np.argmax(min_dist)))
+        return cls(indices, np.array(from_columns, dtype=np.float32).T.copy(),
+                   np.array(to_columns, dtype=np.float32).T.copy())
+
+    def save(self, file_name):
+        np.savez_compressed(file_name,
+                            landmark_indices=self.landmark_indices,
+                            from_landmarks=self.from_landmarks,
+                            to_landmarks=self.to_landmarks)
+
+    @classmethod
+    def load(cls, file_name):
+        with np.load(file_name) as data:
+            return cls(data['landmark_indices'], data['from_landmarks'],
+                       data['to_landmarks'])
+
+
+def _finite(dist):
+    """ Copy of dist with unreachable states set to -1. """
+    dist = dist.copy()
+    dist[np.isinf(dist)] = -1
+    return dist
+
+
+class ALTProblem(book_search.QueryProblem):
+    """Wrap a grid problem so that heuristic uses the landmark tables.  The
+    start and goal default to those of the wrapped problem, which makes it
+    cheap to pose many queries against the same map.
+
+    """
+
+    def __init__(self, problem, tables, start=None, goal=None):
+        book_search.QueryProblem.__init__(self, problem, start, goal)
+        self.tables = tables
+        goal_index = problem.state_index(self._goal)
+        self._goal_from = tables.from_landmarks[goal_index]
+        self._goal_to = tables.to_landmarks[goal_index]
+
+    def heuristic(self, state):
+        index = self.problem.state_index(state)
+        bounds = np.concatenate(
+            [self._goal_from - self.tables.from_landmarks[index],
+             self.tables.to_landmarks[index] - self._goal_to])
+        # inf - inf is nan: that landmark says nothing about this pair,
+        # and fmax skips it.  If every bound is nan, max keeps the
+        # straight line distance because it is the first argument.
+        # Subtracting the rounding error keeps the bounds admissible.
+        return max(self.problem.distance(state, self._goal),
+                   np.fmax.reduce(bounds) - self.tables.rounding_error)
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Precompute landmark tables for a grid map file.")
+    parser.add_argument("map_file")
+    parser.add_argument("table_file", help="output .npz file")
+    parser.add_argument("--landmarks", type=int, default=8)
+    args = parser.parse_args()
+    problem = book_search.load_grid_problem(args.map_file,
+                                            book_search.ArrayGridProblem)
+    LandmarkTables.build(problem, args.landmarks).save(args.table_file)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,252 @@
+""" Parallel delta-stepping single-source shortest paths on large grids.
+
+Delta-stepping keeps tentative distances in buckets of width delta and
+settles one bucket at a time.  Inside a bucket, all states whose
+distance changed are relaxed together in rounds, so the work of each
+round can be split between workers.  Small deltas approach Dijkstra's
+order (little wasted work, many rounds); large deltas approach
+Bellman-Ford (few rounds, but states are improved several times).
+
+Here the padded cost array of an ArrayGridProblem is split into bands
+of rows, one per worker process.  Costs, distances and parent states
+live in shared memory.  Each round has a read step, in which every
+worker computes new distances for the cells of its own band that
+neighbor a changed cell (including changed cells just outside the
+band), and a write step, in which it stores them.  The steps are
+separated by barriers, so no cell is read while it is written, and the
+results do not depend on the number of workers or on timing.
+
+Reference: Meyer and Sanders, "Delta-stepping: a parallelizable
+shortest path algorithm", Journal of Algorithms 49 (2003).
+"""
+import argparse
+import multiprocessing
+import time
+from multiprocessing import shared_memory
+
+import numpy as np
+
+import book_search
+
+INF = float('inf')
+
+
+def _attach(name, shape, dtype):
+    """ Return (SharedMemory, array view) for an existing block. """
+    block = shared_memory.SharedMemory(name=name)
+    return block, np.ndarray(shape, dtype=dtype, buffer=block.buf)
+
+
+def _worker(worker, row_bounds, padded_width, names, size, source, delta,
+            barrier):
+    """Relax the cells in padded rows row_bounds[worker] to
+    row_bounds[worker + 1] until no distance changes anywhere.
+
+    """
+    blocks = []
+    arrays = {}
+    for key, dtype in [('costs', np.float32), ('dist', np.float64),
+                       ('parent', np.int64), ('changed', np.uint8)]:
+        block, arrays[key] = _attach(names[key], (size,), dtype)
+        blocks.append(block)
+    num_workers = len(row_bounds) - 1
+    for key, dtype in [('active', np.int64), ('lowest', np.float64)]:
+        block, arrays[key] = _attach(names[key], (num_workers,), dtype)
+        blocks.append(block)
+    costs = arrays['costs']
+    dist = arrays['dist']
+    parent = arrays['parent']
+    changed = arrays['changed']
+    active_counts = arrays['active']
+    lowest_pending = arrays['lowest']
+
+    w = padded_width
+    offsets = np.array([-w - 1, w + 1, w - 1, -w + 1, w, -w, 1, -1])
+    lengths = np.array([np.sqrt(2.0)] * 4 + [1.0] * 4)
+    first_row = row_bounds[worker]
+    last_row = row_bounds[worker + 1]
+    low = first_row * w
+    high = last_row * w
+
+    threshold = delta
+    active = np.array([source] if low <= source < high else [],
+                      dtype=np.int64)
+    pending = []
+    try:
+        while True:
+            # Publish this band's changed cells, then read.
+            changed[active] = 1
+            barrier.wait()
+            above = np.flatnonzero(changed[low - w:low]) + (low - w)
+            below = np.flatnonzero(changed[high:high + w]) + high
+            sources = np.concatenate([active, above, below])
+            targets = np.unique((sources[:, None] + offsets).ravel())
+            targets = targets[(targets >= low) & (targets < high)]
+            targets = targets[costs[targets] != INF]
+            values = dist[targets[:, None] + offsets] + lengths
+            best = np.argmin(values, axis=1)
+            new_dist = (values[np.arange(targets.size), best] +
+                        costs[targets])
+            better = new_dist < dist[targets]
+            targets = targets[better]
+            new_dist = new_dist[better]
+            new_parent = targets + offsets[best[better]]
+            barrier.wait()
+
+            # Write, and sort the improved cells into this bucket or
+            # later ones.
+            changed[active] = 0
+            dist[targets] = new_dist
+            parent[targets] = new_parent
+            in_bucket = new_dist < threshold
+            active = targets[in_bucket]
+            if not in_bucket.all():
+                pending.append(targets[~in_bucket])
+            active_counts[worker] = active.size
+            barrier.wait()
+            if active_counts.sum() > 0:
+                continue
+
+            # The bucket is settled: move on to the lowest pending one.
+            # Cells below the old threshold were relaxed already.
+            if pending:
+                pending = np.unique(np.concatenate(pending))
+                pending = pending[dist[pending] >= threshold]
+            lowest_pending[worker] = (dist[pending].min() if len(pending)
+                                      else INF)
+            barrier.wait()
+            lowest = lowest_pending.min()
+            if lowest == INF:
+                return
+            threshold = (np.floor(lowest / delta) + 1) * delta
+            if len(pending):
+                in_bucket = dist[pending] < threshold
+                active = pending[in_bucket]
+                pending = [pending[~in_bucket]]
+            else:
+                pending = []
+    finally:
+        del costs, dist, parent, changed, active_counts, lowest_pending
+        arrays.clear()
+        for block in blocks:
+            block.close()
+
+
+class DeltaStepping(object):
+    """
+    Shortest path distances from one state to every state of an
+    ArrayGridProblem, computed by num_workers processes.
+
+    dist and parent are NumPy arrays indexed by state (as for
+    book_search.array_search): dist holds the cost of the cheapest path
+    from the source (infinite if unreachable) and parent the previous
+    state on that path (-1 for the source and unreachable states).
+    """
+
+    def __init__(self, problem, delta=10.0, num_workers=4):
+        self.problem = problem
+        self.delta = delta
+        self.num_workers = num_workers
+
+    def _run_workers(self, names, size, source, num_workers):
+        height = self.problem.grid_height
+        # Padded rows 1 .. grid_height hold the cells.
+        row_bounds = [int(round(1 + height * i / float(num_workers)))
+                      for i in range(num_workers + 1)]
+        barrier = multiprocessing.Barrier(num_workers)
+        processes = [multiprocessing.Process(
+            target=_worker, args=(i, row_bounds, self.problem.padded_width,
+                                  names, size, source, self.delta, barrier))
+            for i in range(num_workers)]
+        for process in processes:
+            process.start()
+        try:
+            while any(process.is_alive() for process in processes):
+                for process in processes:
+                    process.join(.05)
+                    if process.exitcode not in (None, 0):
+                        raise RuntimeError(
+                            "delta-stepping worker exited with code {}".
+                            format(process.exitcode))
+        finally:
+            barrier.abort()
+            for process in processes:
+                if process.is_alive():
+                    process.terminate()
+                process.join()
+
+    def search(self, source=None):
+        """Compute and return (dist, parent) for paths from source (by
+        default the problem's start).
+
+        """
+        problem = self.problem
+        source = problem.start() if source is None else source
+        size = problem.num_indices()
+        num_workers = max(1, min(self.num_workers, problem.grid_height))
+        specs = [('costs', size, np.float32), ('dist', size, np.float64),
+                 ('parent', size, np.int64), ('changed', size, np.uint8),
+                 ('active', num_workers, np.int64),
+                 ('lowest', num_workers, np.float64)]
+        blocks = []
+        arrays = {}
+        try:
+            for key, length, dtype in specs:
+                block = shared_memory.SharedMemory(
+                    create=True, size=length * np.dtype(dtype).itemsize)
+                blocks.append(block)
+                arrays[key] = np.ndarray((length,), dtype=dtype,
+                                         buffer=block.buf)
+            arrays['costs'][:] = problem.costs.reshape(-1)
+            arrays['dist'][:] = INF
+            arrays['dist'][source] = 0.0
+            arrays['parent'][:] = -1
+            arrays['changed'][:] = 0
+            names = dict((key, block.name)
+                         for (key, _, _), block in zip(specs, blocks))
+            self._run_workers(names, size, source, num_workers)
+            self.dist = arrays['dist'].copy()
+            self.parent = arrays['parent'].copy()
+        finally:
+            # The views must go before the blocks can be closed.
+            arrays.clear()
+            for block in blocks:
+                block.close()
+                block.unlink()
+        return self.dist, self.parent
+
+    def path(self, state):
+        """ Path from the source to state, or None if it was not reached. """
+        if self.dist[state] == INF:
+            return None
+        path = [state]
+        while self.parent[path[-1]] != -1:
+            path.append(int(self.parent[path[-1]]))
+        path.reverse()
+        return path
+
+
+def delta_stepping(problem, source=None, delta=10.0, num_workers=4):
+    """ (dist, parent) arrays for paths from source; see DeltaStepping. """
+    return DeltaStepping(problem, delta, num_workers).search(source)
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Delta-stepping on a grid map file.")
+    parser.add_argument("map_file", nargs='?', default='filled_grid_cells.dat')
+    parser.add_argument("--delta", type=float, default=10.0)
+    parser.add_argument("--workers", type=int, default=4)
+    args = parser.parse_args()
+    problem = book_search.load_grid_problem(args.map_file,
+                                            book_search.ArrayGridProblem)
+    start_time = time.perf_counter()
+    dist, parent = delta_stepping(problem, delta=args.delta,
+                                  num_workers=args.workers)
+    seconds = time.perf_counter() - start_time
+    print("reached {} states in {:.3f} seconds, cost to goal {:.3f}".format(
+        int(np.isfinite(dist).sum()), seconds, dist[problem.goal()]))
+
+
+if __name__ == "__main__":
+    main()
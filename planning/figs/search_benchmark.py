@@ -0,0 +1,679 @@
+""" Headless throughput benchmarks for the grid searches in book_search.
+
+Example:
+
+    python search_benchmark.py --sizes 100 500 1000 --max-expansions 20000
+
+Each search is run on a randomly generated grid.  Searches that reach
+--max-expansions are stopped early, so the reported expansion rates are
+comparable across grid sizes even when a full search would take far too
+long.
+
+The --suite option runs bfs, dfs, dijkstra and astar on random and maze
+maps of several sizes and densities and writes a CSV table, e.g.
+
+    python search_benchmark.py --suite --sizes 64 128 --output before.csv
+
+The maps only depend on --seed, so tables from different commits can be
+compared row by row.
+"""
+import argparse
+import csv
+import random
+import sys
+import time
+import tracemalloc
+
+import numpy as np
+
+import anytime_search
+import book_search
+import bidirectional_search
+import hierarchical_search
+import jump_point_search
+import landmarks
+import parallel_search
+
+
+class BudgetExhausted(Exception):
+    pass
+
+
+class BudgetProblem(object):
+    """Wrap a problem, counting expansions (calls to successors) and
+    raising BudgetExhausted once max_expansions is exceeded.
+
+    """
+
+    def __init__(self, problem, max_expansions=None):
+        self.problem = problem
+        self.max_expansions = max_expansions
+        self.expansions = 0
+
+    def start(self):
+        return self.problem.start()
+
+    def goal(self):
+        return self.problem.goal()
+
+    def is_goal(self, state):
+        return self.problem.is_goal(state)
+
+    def successors(self, state):
+        self.expansions += 1
+        if (self.max_expansions is not None and
+                self.expansions > self.max_expansions):
+            self.expansions -= 1
+            raise BudgetExhausted()
+        return self.problem.successors(state)
+
+    def cost(self, state, next_state):
+        return self.problem.cost(state, next_state)
+
+    def heuristic(self, state):
+        return self.problem.heuristic(state)
+
+
+def random_costs(rows, cols, density, seed, keep_free=()):
+    """Return a (rows, cols) array of cell costs in which each cell is
+    blocked (infinite cost) with probability density.  Cells in
+    keep_free are never blocked.
+
+    """
+    rng = np.random.RandomState(seed)
+    costs = np.zeros((rows, cols), dtype=np.float32)
+    costs[rng.random_sample((rows, cols)) < density] = np.inf
+    for row, col in keep_free:
+        costs[row, col] = 0.0
+    return costs
+
+
+def grid_problem_from_costs(costs, start, goal, problem_class):
+    rows, cols = costs.shape
+    if problem_class is book_search.ArrayGridProblem:
+        return problem_class(cols, rows, start, goal, costs=costs)
+    problem = problem_class(cols, rows, start, goal,
+                            zip(*np.nonzero(np.isinf(costs))))
+    for row, col in zip(*np.nonzero(costs == 2.0)):
+        problem.grid[row][col].cost = 2.0
+    return problem
+
+
+def random_grid_problem(size, density=.2, seed=0, start=(.1, .1),
+                        goal=(.9, .9), problem_class=book_search.GridProblem):
+    """ Square grid problem with randomly placed obstacles. """
+    keep_free = [(int(start[0] * size), int(start[1] * size)),
+                 (int(goal[0] * size), int(goal[1] * size))]
+    costs = random_costs(size, size, density, seed, keep_free)
+    return grid_problem_from_costs(costs, start, goal, problem_class)
+
+
+def corridor_grid_problem(length, width=5,
+                          problem_class=book_search.GridProblem):
+    """A length x length grid where only a horizontal corridor of the given
+    width is free.  The start and goal are at opposite ends.
+
+    """
+    costs = np.full((length, length), np.inf, dtype=np.float32)
+    top = (length - width) // 2
+    costs[top:top + width, :] = 0.0
+    middle = (top + width // 2 + .5) / length
+    return grid_problem_from_costs(costs, (middle, 0.0),
+                                   (middle, (length - .5) / length),
+                                   problem_class)
+
+
+def maze_costs(size, density, seed, keep_free=()):
+    """Return a (size, size) array of cell costs for a maze.  A perfect
+    maze is carved by a randomized depth first search over the cells with
+    odd coordinates, then randomly chosen walls are knocked out until at
+    most a fraction density of the cells is blocked, which opens up loops.
+
+    """
+    rng = np.random.RandomState(seed)
+    costs = np.full((size, size), np.inf, dtype=np.float32)
+    cells = [(row, col) for row in range(1, size - 1, 2)
+             for col in range(1, size - 1, 2)]
+    if cells:
+        start = cells[rng.randint(len(cells))]
+        costs[start] = 0.0
+        stack = [start]
+        while stack:
+            row, col = stack[-1]
+            options = [(row + dr, col + dc)
+                       for dr, dc in [(-2, 0), (2, 0), (0, -2), (0, 2)]
+                       if 0 < row + dr < size - 1 and 0 < col + dc < size - 1
+                       and costs[row + dr, col + dc] == np.inf]
+            if not options:
+                stack.pop()
+                continue
+            next_row, next_col = options[rng.randint(len(options))]
+            costs[(row + next_row) // 2, (col + next_col) // 2] = 0.0
+            costs[next_row, next_col] = 0.0
+            stack.append((next_row, next_col))
+
+    walls = np.flatnonzero(np.isinf(costs))
+    excess = len(walls) - int(density * costs.size)
+    if excess > 0:
+        costs.flat[rng.choice(walls, excess, replace=False)] = 0.0
+    for row, col in keep_free:
+        costs[row, col] = 0.0
+    return costs
+
+
+def maze_grid_problem(size, density=.2, seed=0, start=(.1, .1),
+                      goal=(.9, .9), problem_class=book_search.GridProblem):
+    """ Square maze with a fraction density of blocked cells. """
+    keep_free = [(int(start[0] * size), int(start[1] * size)),
+                 (int(goal[0] * size), int(goal[1] * size))]
+    costs = maze_costs(size, density, seed, keep_free)
+    return grid_problem_from_costs(costs, start, goal, problem_class)
+
+
+def time_search(search, problem, max_expansions=None):
+    """Run search on problem.
+
+    Returns: (expansions, seconds, finished) where finished is False if
+    the expansion budget ran out before the search terminated.
+    """
+    wrapped = BudgetProblem(problem, max_expansions)
+    finished = True
+    start_time = time.perf_counter()
+    try:
+        search(wrapped)
+    except BudgetExhausted:
+        finished = False
+    seconds = time.perf_counter() - start_time
+    return wrapped.expansions, seconds, finished
+
+
+GRIDS = {'objects': book_search.GridProblem,
+         'array': book_search.ArrayGridProblem}
+
+SEARCHES = {'dijkstra': book_search.dijkstra_search,
+            'astar': book_search.astar_search}
+
+SUITE_SEARCHES = {'bfs': book_search.bfs,
+                  'dfs': book_search.dfs,
+                  'dijkstra': book_search.dijkstra_search,
+                  'astar': book_search.astar_search}
+
+MAPS = {'random': random_grid_problem,
+        'maze': maze_grid_problem}
+
+SUITE_COLUMNS = ['map', 'size', 'density', 'seed', 'search', 'expansions',
+                 'seconds', 'expansions_per_sec', 'peak_kb', 'finished',
+                 'path_length', 'path_cost']
+
+
+def queue_benchmark(sizes, queues, searches, density, seed, max_expansions,
+                    grid='objects', stats_file=None):
+    """Time each search with each priority queue.  If stats_file is given,
+    a line of book_search.SearchStats is appended to it for every run.
+
+    """
+    print("{:>6} {:>9} {:>8} {:>10} {:>9} {:>12} {:>5}".format(
+        "size", "search", "queue", "expansions", "seconds", "exp/sec",
+        "done"))
+    for size in sizes:
+        problem = random_grid_problem(size, density, seed,
+                                      problem_class=GRIDS[grid])
+        for search_name in searches:
+            for queue_name in queues:
+                queue = book_search.PRIORITY_QUEUES[queue_name]
+                # Instrumentation slows the searches down, so only
+                # collect statistics when they are wanted.
+                stats = None
+                if stats_file is not None:
+                    stats = book_search.SearchStats()
+                search = (lambda prob, s=SEARCHES[search_name], q=queue:
+                          s(prob, Collection=q, stats=stats))
+                expansions, seconds, finished = time_search(search, problem,
+                                                            max_expansions)
+                if stats is not None:
+                    stats.finish()
+                    stats.write_json(stats_file, map='random', size=size,
+                                     density=density, seed=seed, grid=grid,
+                                     search=search_name, queue=queue_name,
+                                     finished=finished)
+                print("{:>6} {:>9} {:>8} {:>10} {:>9.3f} {:>12.0f} {:>5}".
+                      format(size, search_name, queue_name, expansions,
+                             seconds, expansions / seconds, str(finished)))
+
+
+def path_cost(problem, path):
+    return sum(problem.cost(path[i], path[i + 1])
+               for i in range(len(path) - 1))
+
+
+def jps_benchmark(sizes, density, seed):
+    """ Compare jump point search with astar_search. """
+    problems = [('filled_grid_cells.dat',
+                 book_search.load_grid_problem('filled_grid_cells.dat'))]
+    for size in sizes:
+        problems.append(('random {0}x{0}'.format(size),
+                         random_grid_problem(size, density, seed)))
+
+    print("{:>22} {:>6} {:>10} {:>9} {:>12}".format(
+        "map", "search", "expansions", "seconds", "cost"))
+    for name, problem in problems:
+        expansions, seconds, _ = time_search(book_search.astar_search,
+                                             problem)
+        path = book_search.astar_search(problem)
+        cost = path_cost(problem, path) if path is not None else float('inf')
+        print("{:>22} {:>6} {:>10} {:>9.3f} {:>12.3f}".format(
+            name, "astar", expansions, seconds, cost))
+
+        jps = jump_point_search.JumpPointSearch(problem)
+        start_time = time.perf_counter()
+        path = jps.search()
+        seconds = time.perf_counter() - start_time
+        cost = path_cost(problem, path) if path is not None else float('inf')
+        print("{:>22} {:>6} {:>10} {:>9.3f} {:>12.3f}".format(
+            name, "jps", jps.expansions, seconds, cost))
+
+
+def bidirectional_benchmark(sizes, density, seed):
+    """ Compare bidirectional searches with their one directional versions. """
+    problems = [('filled_grid_cells.dat',
+                 book_search.load_grid_problem('filled_grid_cells.dat'))]
+    for size in sizes:
+        problems.append(('corridor {0}x{0}'.format(size),
+                         corridor_grid_problem(size)))
+        problems.append(('random {0}x{0}'.format(size),
+                         random_grid_problem(size, density, seed)))
+    pairs = [('dijkstra', book_search.dijkstra_search,
+              bidirectional_search.BidirectionalSearch, False),
+             ('astar', book_search.astar_search,
+              bidirectional_search.BidirectionalSearch, True)]
+
+    print("{:>22} {:>9} {:>10} {:>10} {:>8} {:>9} {:>9}".format(
+        "map", "search", "forward", "bidir", "saved", "seconds", "bidir_sec"))
+    for name, problem in problems:
+        for search_name, search, Bidirectional, use_heuristic in pairs:
+            expansions, seconds, _ = time_search(search, problem)
+            bidirectional = Bidirectional(problem, use_heuristic)
+            start_time = time.perf_counter()
+            bidirectional.search()
+            bidir_seconds = time.perf_counter() - start_time
+            saved = 1.0 - bidirectional.expansions / float(expansions)
+            print("{:>22} {:>9} {:>10} {:>10} {:>7.1f}% {:>9.3f} {:>9.3f}".
+                  format(name, search_name, expansions,
+                         bidirectional.expansions, 100 * saved, seconds,
+                         bidir_seconds))
+
+
+def alt_benchmark(sizes, density, seed, num_queries=50, num_landmarks=8):
+    """Run random start/goal queries with and without landmark heuristics
+    and report total expansions and times.
+
+    """
+    print("{:>18} {:>8} {:>11} {:>11} {:>8} {:>9} {:>9}".format(
+        "map", "build_s", "euclid_exp", "alt_exp", "ratio", "euclid_s",
+        "alt_s"))
+    for size in sizes:
+        problem = random_grid_problem(
+            size, density, seed, problem_class=book_search.ArrayGridProblem)
+        start_time = time.perf_counter()
+        tables = landmarks.LandmarkTables.build(problem, num_landmarks)
+        build_seconds = time.perf_counter() - start_time
+
+        rng = np.random.RandomState(seed)
+        free = np.flatnonzero(np.isfinite(problem.costs))
+        totals = np.zeros(4)
+        for _ in range(num_queries):
+            start, goal = (int(s) for s in rng.choice(free, 2))
+            alt_problem = landmarks.ALTProblem(problem, tables, start, goal)
+            euclid_problem = landmarks.ALTProblem(problem, tables, start, goal)
+            euclid_problem.heuristic = (
+                lambda state, goal=goal: problem.distance(state, goal))
+            euclid = time_search(book_search.astar_search, euclid_problem)
+            alt = time_search(book_search.astar_search, alt_problem)
+            totals += [euclid[0], alt[0], euclid[1], alt[1]]
+        print("{:>18} {:>8.2f} {:>11.0f} {:>11.0f} {:>8.3f} {:>9.3f} {:>9.3f}".
+              format('random {0}x{0}'.format(size), build_seconds, totals[0],
+                     totals[1], totals[1] / totals[0], totals[2], totals[3]))
+
+
+def hpa_benchmark(sizes, density, seed, num_queries=20, cluster_size=10):
+    """Compare HPA* queries with flat A* on random start/goal pairs.  Also
+    times an incremental update after blocking a few cells.
+
+    """
+    print("{:>18} {:>8} {:>9} {:>9} {:>10} {:>9}".format(
+        "map", "build_s", "flat_s", "hpa_s", "cost_ratio", "update_s"))
+    for size in sizes:
+        problem = random_grid_problem(size, density, seed)
+        start_time = time.perf_counter()
+        planner = hierarchical_search.HPAStar(problem, cluster_size)
+        build_seconds = time.perf_counter() - start_time
+
+        rng = np.random.RandomState(seed)
+        free = [state for row in problem.grid for state in row
+                if state.cost != float('inf')]
+        flat_seconds = hpa_seconds = 0.0
+        flat_cost = hpa_cost = 0.0
+        for _ in range(num_queries):
+            start, goal = (free[i] for i in rng.choice(len(free), 2))
+            query = book_search.QueryProblem(problem, start, goal)
+            start_time = time.perf_counter()
+            flat_path = book_search.astar_search(query)
+            flat_seconds += time.perf_counter() - start_time
+            start_time = time.perf_counter()
+            hpa_path = planner.plan(start, goal)
+            hpa_seconds += time.perf_counter() - start_time
+            if flat_path is not None:
+                flat_cost += path_cost(problem, flat_path)
+                hpa_cost += path_cost(problem, hpa_path)
+
+        changed = [free[i] for i in rng.choice(len(free), 10)]
+        for state in changed:
+            state.cost = float('inf')
+        start_time = time.perf_counter()
+        planner.cells_changed(changed)
+        update_seconds = time.perf_counter() - start_time
+
+        print("{:>18} {:>8.2f} {:>9.3f} {:>9.3f} {:>10.3f} {:>9.3f}".format(
+            'random {0}x{0}'.format(size), build_seconds, flat_seconds,
+            hpa_seconds, hpa_cost / flat_cost, update_seconds))
+
+
+def flow_field_benchmark(sizes, density, seed, num_agents=100):
+    """Time one cost-to-go field plus path extraction for many agents
+    against one A* search per agent.
+
+    """
+    print("{:>18} {:>7} {:>9} {:>9} {:>9}".format(
+        "map", "agents", "field_s", "paths_s", "astar_s"))
+    for size in sizes:
+        problem = random_grid_problem(
+            size, density, seed, problem_class=book_search.ArrayGridProblem)
+        rng = np.random.RandomState(seed)
+        free = np.flatnonzero(np.isfinite(problem.costs))
+        starts = [int(s) for s in rng.choice(free, num_agents)]
+
+        start_time = time.perf_counter()
+        field = problem.cost_to_go()
+        field_seconds = time.perf_counter() - start_time
+        start_time = time.perf_counter()
+        for start in starts:
+            field.path(start)
+        path_seconds = time.perf_counter() - start_time
+
+        start_time = time.perf_counter()
+        for start in starts:
+            book_search.astar_search(book_search.QueryProblem(problem, start))
+        astar_seconds = time.perf_counter() - start_time
+        print("{:>18} {:>7} {:>9.3f} {:>9.3f} {:>9.3f}".format(
+            'random {0}x{0}'.format(size), num_agents, field_seconds,
+            path_seconds, astar_seconds))
+
+
+def suite_benchmark(sizes, densities, seed, max_expansions,
+                    maps=('random', 'maze'),
+                    searches=('bfs', 'dfs', 'dijkstra', 'astar'),
+                    output=None):
+    """Run every search on every map and write one CSV row per run to
+    output (a file name, or stdout if None).
+
+    Each run is timed once as is and then repeated under tracemalloc to
+    measure the peak memory allocated by the search, since tracing slows
+    the search down too much to time it at the same time.
+    """
+    handle = sys.stdout if output is None else open(output, 'w')
+    writer = csv.writer(handle, lineterminator='\n')
+    writer.writerow(SUITE_COLUMNS)
+    for map_name in maps:
+        for size in sizes:
+            for density in densities:
+                problem = MAPS[map_name](size, density, seed)
+                for search_name in searches:
+                    search = SUITE_SEARCHES[search_name]
+                    expansions, seconds, finished = time_search(
+                        search, problem, max_expansions)
+
+                    tracemalloc.start()
+                    try:
+                        path = search(BudgetProblem(problem, max_expansions))
+                    except BudgetExhausted:
+                        path = None
+                    peak = tracemalloc.get_traced_memory()[1]
+                    tracemalloc.stop()
+
+                    if path is None:
+                        length, cost = '', ''
+                    else:
+                        length = len(path)
+                        cost = '{:.4f}'.format(path_cost(problem, path))
+                    writer.writerow([map_name, size, density, seed,
+                                     search_name, expansions,
+                                     '{:.4f}'.format(seconds),
+                                     '{:.0f}'.format(expansions / seconds),
+                                     peak // 1024, int(finished), length,
+                                     cost])
+                    handle.flush()
+    if output is not None:
+        handle.close()
+
+
+def anytime_benchmark(sizes, density, seed, initial_weight=3.0):
+    """Report when ARA* finds each improved path, against one A* search."""
+    print("{:>18} {:>8} {:>10} {:>9} {:>9} {:>7}".format(
+        "map", "search", "expansions", "seconds", "cost", "bound"))
+    for size in sizes:
+        name = 'random {0}x{0}'.format(size)
+        problem = random_grid_problem(size, density, seed)
+        expansions, seconds, _ = time_search(book_search.astar_search,
+                                             problem)
+        path = book_search.astar_search(problem)
+        cost = path_cost(problem, path) if path is not None else float('inf')
+        print("{:>18} {:>8} {:>10} {:>9.3f} {:>9.3f} {:>7.3f}".format(
+            name, "astar", expansions, seconds, cost, 1.0))
+        planner = anytime_search.ARAStar(problem, initial_weight)
+        planner.search()
+        for expansions, seconds, cost, bound in planner.solutions:
+            print("{:>18} {:>8} {:>10} {:>9.3f} {:>9.3f} {:>7.3f}".format(
+                name, "ara*", expansions, seconds, cost, bound))
+
+
+def multi_goal_benchmark(sizes, density, seed, num_goals=20):
+    """Find the nearest of num_goals random free cells with one A* search
+    per goal and with a single MultiGoalProblem search.
+
+    """
+    print("{:>18} {:>9} {:>8} {:>10} {:>9} {:>12}".format(
+        "map", "search", "searches", "expansions", "seconds", "cost"))
+    for size in sizes:
+        name = 'random {0}x{0}'.format(size)
+        problem = random_grid_problem(size, density, seed)
+        free = [state for row in problem.grid for state in row
+                if state.cost != float('inf')]
+        goals = random.Random(seed).sample(free, num_goals)
+
+        total_expansions = 0
+        total_seconds = 0.0
+        best = float('inf')
+        for goal in goals:
+            single = book_search.MultiGoalProblem(problem, [goal])
+            expansions, seconds, _ = time_search(book_search.astar_search,
+                                                 single)
+            total_expansions += expansions
+            total_seconds += seconds
+            path = book_search.astar_search(single)
+            if path is not None:
+                best = min(best, path_cost(problem, path))
+        print("{:>18} {:>9} {:>8} {:>10} {:>9.3f} {:>12.3f}".format(
+            name, "per goal", num_goals, total_expansions, total_seconds,
+            best))
+
+        multi = book_search.MultiGoalProblem(problem, goals)
+        expansions, seconds, _ = time_search(book_search.astar_search, multi)
+        path = book_search.astar_search(multi)
+        cost = path_cost(problem, path) if path is not None else float('inf')
+        print("{:>18} {:>9} {:>8} {:>10} {:>9.3f} {:>12.3f}".format(
+            name, "nearest", 1, expansions, seconds, cost))
+
+
+def delta_stepping_benchmark(sizes, density, seed, workers, delta=20.0):
+    """Time delta-stepping with each number of workers against one heap
+    based Dijkstra pass (book_search.distance_array) over the same map.
+
+    """
+    print("{:>18} {:>15} {:>9} {:>8} {:>10}".format(
+        "map", "search", "seconds", "speedup", "max_error"))
+    for size in sizes:
+        name = 'random {0}x{0}'.format(size)
+        problem = random_grid_problem(
+            size, density, seed, problem_class=book_search.ArrayGridProblem)
+        start_time = time.perf_counter()
+        expected = book_search.distance_array(problem, [problem.start()])
+        seconds = time.perf_counter() - start_time
+        print("{:>18} {:>15} {:>9.3f} {:>8} {:>10}".format(
+            name, "dijkstra", seconds, "", ""))
+        reached = np.isfinite(expected)
+        base_seconds = None
+        for num_workers in workers:
+            start_time = time.perf_counter()
+            dist, _ = parallel_search.delta_stepping(problem, delta=delta,
+                                                     num_workers=num_workers)
+            seconds = time.perf_counter() - start_time
+            if base_seconds is None:
+                base_seconds = seconds
+            error = np.abs(dist[reached] - expected[reached]).max()
+            print("{:>18} {:>15} {:>9.3f} {:>8.2f} {:>10.2g}".format(
+                name, "delta x{}".format(num_workers), seconds,
+                base_seconds / seconds, error))
+
+
+def array_benchmark(sizes, density, seed):
+    """Compare the node-based searches with the array-based ones on the
+    same ArrayGridProblem, including their peak memory.
+
+    """
+    pairs = [('dijkstra', book_search.dijkstra_search,
+              book_search.array_dijkstra_search),
+             ('astar', book_search.astar_search,
+              book_search.array_astar_search)]
+    print("{:>18} {:>9} {:>6} {:>9} {:>10} {:>12}".format(
+        "map", "search", "core", "seconds", "peak_kb", "cost"))
+    for size in sizes:
+        name = 'random {0}x{0}'.format(size)
+        problem = random_grid_problem(
+            size, density, seed, problem_class=book_search.ArrayGridProblem)
+        for search_name, node_search, array_search in pairs:
+            for core, search in [('nodes', node_search),
+                                 ('array', array_search)]:
+                start_time = time.perf_counter()
+                path = search(problem)
+                seconds = time.perf_counter() - start_time
+                tracemalloc.start()
+                search(problem)
+                peak = tracemalloc.get_traced_memory()[1]
+                tracemalloc.stop()
+                cost = (path_cost(problem, path) if path is not None
+                        else float('inf'))
+                print("{:>18} {:>9} {:>6} {:>9.3f} {:>10} {:>12.3f}".format(
+                    name, search_name, core, seconds, peak // 1024, cost))
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sizes", type=int, nargs='+',
+                        default=[100, 250, 500, 1000],
+                        help="grid side lengths (2000 and 4000 need "
+                        "several GB of memory unless --grid array is used)")
+    parser.add_argument("--queues", nargs='+',
+                        default=['indexed', 'lazy', 'bucket', 'linear'],
+                        choices=sorted(book_search.PRIORITY_QUEUES.keys()))
+    parser.add_argument("--searches", nargs='+', default=['dijkstra', 'astar'],
+                        choices=sorted(SEARCHES.keys()))
+    parser.add_argument("--grid", default='objects',
+                        choices=sorted(GRIDS.keys()),
+                        help="GridProblem or ArrayGridProblem")
+    parser.add_argument("--density", type=float, default=.2,
+                        help="fraction of blocked cells")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--max-expansions", type=int, default=20000,
+                        help="stop each search after this many expansions")
+    parser.add_argument("--stats", metavar="FILE",
+                        help="append the statistics of every run to FILE "
+                        "as JSON lines")
+    parser.add_argument("--suite", action="store_true",
+                        help="run bfs, dfs, dijkstra and astar on random "
+                        "and maze maps and write a CSV table")
+    parser.add_argument("--densities", type=float, nargs='+',
+                        default=[.1, .25, .4],
+                        help="fractions of blocked cells for --suite "
+                        "(a perfect maze blocks about half of the cells, "
+                        "lower densities open it up)")
+    parser.add_argument("--output", metavar="FILE",
+                        help="CSV file for --suite (default: stdout)")
+    parser.add_argument("--jps", action="store_true",
+                        help="compare jump point search with A* instead "
+                        "of comparing priority queues")
+    parser.add_argument("--bidirectional", action="store_true",
+                        help="compare bidirectional searches with their "
+                        "forward-only versions")
+    parser.add_argument("--alt", action="store_true",
+                        help="compare landmark (ALT) heuristics with "
+                        "straight line distance on random queries")
+    parser.add_argument("--hpa", action="store_true",
+                        help="compare hierarchical (HPA*) queries with "
+                        "flat A*")
+    parser.add_argument("--anytime", action="store_true",
+                        help="show the paths ARA* finds over time "
+                        "against A*")
+    parser.add_argument("--flow-field", action="store_true",
+                        help="compare one cost-to-go field with one A* "
+                        "search per agent")
+    parser.add_argument("--multi-goal", action="store_true",
+                        help="compare one A* search per goal with one "
+                        "search for the nearest of many goals")
+    parser.add_argument("--delta-stepping", action="store_true",
+                        help="time parallel delta-stepping with each "
+                        "number of --workers (speedups are relative to "
+                        "the first)")
+    parser.add_argument("--workers", type=int, nargs='+',
+                        default=[1, 2, 4, 8])
+    parser.add_argument("--array", action="store_true",
+                        help="compare the array-based searches with the "
+                        "node-based ones")
+    args = parser.parse_args()
+    if args.delta_stepping:
+        delta_stepping_benchmark(args.sizes, args.density, args.seed,
+                                 args.workers)
+        return
+    if args.multi_goal:
+        multi_goal_benchmark(args.sizes, args.density, args.seed)
+        return
+    if args.array:
+        array_benchmark(args.sizes, args.density, args.seed)
+        return
+    if args.suite:
+        suite_benchmark(args.sizes, args.densities, args.seed,
+                        args.max_expansions, output=args.output)
+        return
+    if args.anytime:
+        anytime_benchmark(args.sizes, args.density, args.seed)
+        return
+    if args.flow_field:
+        flow_field_benchmark(args.sizes, args.density, args.seed)
+        return
+    if args.hpa:
+        hpa_benchmark(args.sizes, args.density, args.seed)
+        return
+    if args.alt:
+        alt_benchmark(args.sizes, args.density, args.seed)
+        return
+    if args.bidirectional:
+        bidirectional_benchmark(args.sizes, args.density, args.seed)
+        return
+    if args.jps:
+        jps_benchmark(args.sizes, args.density, args.seed)
+        return
+    queue_benchmark(args.sizes, args.queues, args.searches, args.density,
+                    args.seed, args.max_expansions, args.grid, args.stats)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,692 @@
+import csv
+import json
+import os
+import tempfile
+import unittest
+from unittest import mock
+import random
+import numpy as np
+import anytime_search
+import book_search
+import bidirectional_search
+import incremental_search
+import hierarchical_search
+import jump_point_search
+import landmarks
+import parallel_search
+import search_benchmark
+from search_benchmark import path_cost, random_grid_problem
+
+
+class TestIndexedPriorityQueue(unittest.TestCase):
+
+    def test_pop_order(self):
+        pq = book_search.IndexedPriorityQueue()
+        rng = random.Random(3)
+        priorities = [rng.random() for _ in range(200)]
+        for i, priority in enumerate(priorities):
+            pq.add(i, priority)
+        popped = []
+        while not pq.is_empty():
+            popped.append(priorities[pq.pop()])
+        self.assertEqual(popped, sorted(priorities))
+
+    def test_bucket_queue(self):
+        pq = book_search.BucketQueue(bucket_width=.5)
+        rng = random.Random(4)
+        priorities = dict((i, rng.uniform(0, 20)) for i in range(300))
+        for i, priority in priorities.items():
+            pq.add(i, priority)
+        for i in range(0, 300, 3):
+            priorities[i] -= 5.0
+            pq.add(i, priorities[i])
+        pq.add(1, priorities[1] + 1.0)  # Higher priority is ignored.
+        pq.add('far', float('inf'))
+        self.assertEqual(len(pq), 301)
+        popped = []
+        while len(pq) > 1:
+            item = pq.pop()
+            popped.append(priorities[item])
+            # Adding below the current bucket must still come out next.
+            if len(popped) == 100:
+                pq.add('low', -1.0)
+                priorities['low'] = -1.0
+        self.assertEqual(popped[:100], sorted(popped[:100]))
+        self.assertEqual(popped[100], -1.0)
+        self.assertEqual(popped[101:], sorted(popped[101:]))
+        self.assertEqual(pq.pop(), 'far')
+        self.assertTrue(pq.is_empty())
+
+    def test_decrease_key(self):
+        pq = book_search.IndexedPriorityQueue()
+        for i in range(10):
+            pq.add(i, 10 + i)
+        self.assertTrue(pq.add(7, 1))
+        self.assertFalse(pq.add(3, 50))  # Higher priority is ignored.
+        self.assertFalse(pq.add(3, 13))
+        self.assertEqual(len(pq), 10)
+        self.assertEqual(pq.priority(3), 13)
+        self.assertIn(7, pq)
+        self.assertEqual(pq.pop(), 7)
+        self.assertNotIn(7, pq)
+        self.assertEqual(sorted(pq), [0, 1, 2, 3, 4, 5, 6, 8, 9])
+
+
+class TestCollections(unittest.TestCase):
+
+    def test_order_and_membership(self):
+        queue = book_search.Queue()
+        stack = book_search.Stack()
+        for i in range(5):
+            queue.add(book_search.Node(i, None))
+            stack.add(book_search.Node(i, None))
+        queue.add(book_search.Node(2, None))
+        self.assertIn(book_search.Node(4, None), queue)
+        self.assertNotIn(book_search.Node(5, None), stack)
+        self.assertEqual([node.state for node in queue], [0, 1, 2, 3, 4, 2])
+        self.assertEqual([queue.pop().state for _ in range(3)], [0, 1, 2])
+        self.assertIn(book_search.Node(2, None), queue)
+        queue.pop()
+        queue.pop()
+        self.assertEqual(queue.pop().state, 2)
+        self.assertNotIn(book_search.Node(2, None), queue)
+        self.assertTrue(queue.is_empty())
+        self.assertEqual(stack.pop().state, 4)
+        self.assertEqual(len(stack), 4)
+
+    def test_bfs_dfs(self):
+        problem = random_grid_problem(30, .2, seed=3)
+        expected = book_search.dijkstra_search(problem)
+        for search in [book_search.bfs, book_search.dfs]:
+            path = search(problem)
+            self.assertEqual(path[0], problem.start())
+            self.assertEqual(path[-1], problem.goal())
+            for state, next_state in zip(path, path[1:]):
+                self.assertIn(next_state, problem.successors(state))
+        # Breadth first search finds a path with the fewest steps.
+        self.assertLessEqual(len(book_search.bfs(problem)),
+                             len(expected))
+
+
+class TestGridSearch(unittest.TestCase):
+
+    def setUp(self):
+        self.problem = random_grid_problem(40, .25, seed=1)
+
+    def test_queues_agree(self):
+        for search in [book_search.dijkstra_search, book_search.astar_search]:
+            linear = search(self.problem, Collection=book_search.PriorityQueue)
+            for queue in book_search.PRIORITY_QUEUES.values():
+                path = search(self.problem, Collection=queue)
+                self.assertAlmostEqual(path_cost(self.problem, path),
+                                       path_cost(self.problem, linear))
+
+    def test_event_stream(self):
+        events = list(book_search.astar_events(self.problem))
+        path = book_search.astar_search(self.problem)
+        self.assertEqual(events[-1].path, path)
+        self.assertEqual(events[-1].state, self.problem.goal())
+        self.assertTrue(all(event.path is None for event in events[:-1]))
+        self.assertEqual(events[0].state, self.problem.start())
+
+        class Recorder(book_search.EventVisualizer):
+            def __init__(self):
+                self.draws = []
+
+            def draw(self, closed=None, frontier=None, solution=None,
+                     pause=False):
+                self.draws.append((len(closed), solution))
+
+        vis = Recorder()
+        vis.draw_every = 10
+        book_search.run_search(book_search.astar_events(self.problem), vis)
+        self.assertEqual(len(vis.draws), (len(events) - 1) // 10 + 1)
+        self.assertEqual(vis.draws[-1], (len(events), path))
+
+        # added lists only the states whose entry in the frontier changed.
+        for Queue in book_search.PRIORITY_QUEUES.values():
+            changes = []
+
+            class RecordingQueue(Queue):
+                def add(self, item, priority):
+                    changed = Queue.add(self, item, priority)
+                    changes.append(changed)
+                    return changed
+
+            events = list(book_search.astar_events(self.problem,
+                                                   RecordingQueue))
+            self.assertIn(False, changes)
+            # The start state is added before the first event.
+            self.assertEqual(sum(len(event.added) for event in events),
+                             changes.count(True) - 1)
+
+    def test_stats(self):
+        events = list(book_search.astar_events(self.problem))
+        stats = book_search.SearchStats()
+        path = book_search.astar_search(self.problem, stats=stats)
+        self.assertEqual(stats.expansions, len(events) - 1)
+        self.assertEqual(stats.peak_closed, len(events))
+        self.assertEqual(stats.generated,
+                         sum(len(self.problem.successors(event.state))
+                             for event in events[:-1]))
+        self.assertGreater(stats.peak_frontier, 0)
+        self.assertAlmostEqual(stats.path_cost,
+                               path_cost(self.problem, path))
+        self.assertGreater(stats.total_time, stats.queue_time)
+
+        stats_file = os.path.join(tempfile.mkdtemp(), 'stats.jsonl')
+        stats.write_json(stats_file, search='astar')
+        book_search.SearchStats().write_json(stats_file, search='none')
+        with open(stats_file) as handle:
+            records = [json.loads(line) for line in handle]
+        self.assertEqual(records[0]['search'], 'astar')
+        self.assertEqual(records[0]['expansions'], stats.expansions)
+        self.assertIsNone(records[1]['path_cost'])
+
+
+class TestBenchmarkSuite(unittest.TestCase):
+
+    def test_maze(self):
+        perfect = search_benchmark.maze_costs(41, 1.0, seed=0)
+        # Cells with odd coordinates are the maze cells: all free.
+        self.assertFalse(np.isinf(perfect[1::2, 1::2]).any())
+        self.assertTrue(np.isinf(perfect[::2, ::2]).all())
+        opened = search_benchmark.maze_costs(41, .3, seed=0)
+        self.assertLessEqual(np.isinf(opened).mean(), .3)
+        problem = search_benchmark.maze_grid_problem(41, 1.0, seed=0)
+        path = book_search.bfs(problem)
+        self.assertIsNotNone(path)
+
+    def test_suite_table(self):
+        output = os.path.join(tempfile.mkdtemp(), 'suite.csv')
+        search_benchmark.suite_benchmark([20], [.2], seed=0,
+                                         max_expansions=100, output=output)
+        with open(output) as handle:
+            rows = list(csv.DictReader(handle))
+        self.assertEqual(len(rows), 8)
+        self.assertEqual(list(rows[0].keys()),
+                         search_benchmark.SUITE_COLUMNS)
+        for row in rows:
+            self.assertLessEqual(int(row['expansions']), 100)
+            self.assertEqual(row['path_length'] == '',
+                             row['finished'] == '0')
+
+
+class TestARAStar(unittest.TestCase):
+
+    def test_bounds(self):
+        for seed in range(3):
+            problem = random_grid_problem(60, .3, seed=seed)
+            expected = path_cost(problem, book_search.astar_search(problem))
+            planner = anytime_search.ARAStar(problem, initial_weight=4.0,
+                                             weight_step=1.0)
+            costs = []
+            for path, cost, bound in planner.improved_paths():
+                self.assertAlmostEqual(path_cost(problem, path), cost)
+                self.assertLessEqual(cost, bound * expected + 1e-9)
+                costs.append(cost)
+            self.assertEqual(costs, sorted(costs, reverse=True))
+            self.assertAlmostEqual(costs[-1], expected)
+            self.assertTrue(planner.finished)
+
+    def test_finished_bound(self):
+        # The last improved path often comes before the bound reaches 1.
+        for seed in range(40):
+            problem = random_grid_problem(40, .3, seed=seed)
+            planner = anytime_search.ARAStar(problem, initial_weight=2.0)
+            path = planner.search()
+            self.assertTrue(planner.finished)
+            if path is not None:
+                self.assertEqual(planner.bound, 1.0)
+                self.assertLessEqual(planner.bound, planner.solutions[-1][3])
+
+    def test_budget(self):
+        problem = random_grid_problem(60, .3, seed=0)
+        expected = path_cost(problem, book_search.astar_search(problem))
+        planner = anytime_search.ARAStar(problem, initial_weight=4.0)
+        path = planner.search(max_expansions=150)
+        self.assertLessEqual(planner.expansions, 150)
+        self.assertFalse(planner.finished)
+        if path is not None:
+            self.assertLessEqual(planner.path_cost,
+                                 planner.bound * expected + 1e-9)
+        planner.search(time_limit=0.0)
+        self.assertEqual(planner.expansions, 0)
+        self.assertIsNone(planner.path)
+
+
+class TestSearchTrace(unittest.TestCase):
+
+    def test_rebuild_steps(self):
+        problem = random_grid_problem(30, .25, seed=5)
+        trace_file = os.path.join(tempfile.mkdtemp(), 'astar.trace')
+        book_search.astar_search(
+            problem, book_search.AsymptoteVisualizer(problem, trace_file))
+        trace = book_search.SearchTrace(trace_file)
+        events = list(book_search.astar_events(problem))
+        self.assertEqual(trace.num_steps, len(events))
+        self.assertEqual(len(trace.obstacles),
+                         sum(state.cost == float('inf')
+                             for row in problem.grid for state in row))
+
+        closed = set()
+        frontier = set()
+        for step, event in enumerate(events, 1):
+            closed.add((event.state.row, event.state.col))
+            frontier.discard((event.state.row, event.state.col))
+            frontier.update((state.row, state.col) for state in event.added)
+            if step in (1, 7, len(events) // 2, len(events) - 1):
+                labels = trace.labels(step)
+                self.assertEqual(set(zip(*np.nonzero(labels == 1))), closed)
+                self.assertEqual(set(zip(*np.nonzero(labels == 2))), frontier)
+        path = set((state.row, state.col) for state in events[-1].path)
+        labels = trace.labels(len(events))
+        self.assertEqual(set(zip(*np.nonzero(labels == 3))), path)
+
+        dat_file = trace_file.replace('.trace', '{:04d}.dat')
+        trace.write_dats(dat_file, [2])
+        with open(dat_file.format(2)) as handle:
+            lines = handle.readlines()
+        self.assertEqual(lines[0], "30, 30\n")
+        self.assertTrue(os.path.exists(dat_file.format(len(events))))
+
+
+class TestGridVisualizer(unittest.TestCase):
+
+    def setUp(self):
+        import pygame
+        self.pygame = pygame
+        patches = [
+            mock.patch.dict(os.environ, {'SDL_VIDEODRIVER': 'dummy'}),
+            # Closing the window right away ends the interactive loop in
+            # the constructor and the pause after the final frame.
+            mock.patch.object(pygame.event, 'get',
+                              return_value=[pygame.event.Event(pygame.QUIT)])]
+        for patch in patches:
+            patch.start()
+            self.addCleanup(patch.stop)
+        self.addCleanup(pygame.quit)
+
+    def test_dirty_rects(self):
+        pygame = self.pygame
+        problem = random_grid_problem(15, .2, seed=4)
+        vis = book_search.GridVisualizer(problem, book_search.astar_search,
+                                         frame_rate=None)
+        events = list(book_search.astar_events(problem))
+        states = [state for row in problem.grid for state in row]
+
+        updates = []
+        vis.reset()
+        touched = set()
+        with mock.patch.object(pygame.display, 'update', updates.append):
+            for event in events:
+                labels = dict(vis.labels)
+                touched.add(event.state)
+                touched.update(event.added)
+                touched.update(event.path or [])
+                vis.update(event)
+                changed = [state for state in states
+                           if vis.labels.get(state) != labels.get(state)]
+                self.assertTrue(set(changed) <= touched)
+                self.assertEqual(
+                    sorted(tuple(rect) for rect in updates[-1]),
+                    sorted(tuple(vis.cell_rect(state.row, state.col))
+                           for state in changed))
+                touched = set(vis.shown_path)
+        self.assertLess(max(len(rects) for rects in updates), len(states))
+
+        # The frame built from the changes equals a full redraw.
+        expected = vis.background.copy()
+        path = set(events[-1].path)
+        for state in states:
+            color = vis.label_color(state, vis.closed, vis.frontier, path)
+            if color is not None:
+                pygame.draw.rect(expected, color,
+                                 vis.cell_rect(state.row, state.col),
+                                 vis.margin * 2)
+        self.assertEqual(pygame.image.tostring(vis.screen, 'RGB'),
+                         pygame.image.tostring(expected, 'RGB'))
+
+
+class TestArrayGridProblem(unittest.TestCase):
+
+    def setUp(self):
+        self.problem = random_grid_problem(
+            40, .25, seed=2, problem_class=book_search.ArrayGridProblem)
+        self.problem.cell_costs[10:30, 20] = 2.0
+
+    def test_matches_grid_problem(self):
+        grid = random_grid_problem(40, .25, seed=2)
+        for row in range(10, 30):
+            if grid.grid[row][20].cost == 0.0:
+                grid.grid[row][20].cost = 2.0
+        for search in [book_search.dijkstra_search, book_search.astar_search]:
+            array_path = search(self.problem)
+            grid_path = search(grid)
+            self.assertAlmostEqual(path_cost(self.problem, array_path),
+                                   path_cost(grid, grid_path))
+
+    def test_array_search(self):
+        problem = self.problem
+        heuristics = problem.heuristic_array()
+        for state in [problem.start(), problem.state_id(15, 19)]:
+            self.assertAlmostEqual(heuristics[state],
+                                   problem.heuristic(state))
+        for search, array_search in [
+                (book_search.dijkstra_search,
+                 book_search.array_dijkstra_search),
+                (book_search.astar_search, book_search.array_astar_search)]:
+            stats = book_search.SearchStats()
+            path = array_search(problem, stats=stats)
+            self.assertEqual(path[0], problem.start())
+            self.assertEqual(path[-1], problem.goal())
+            expected = path_cost(problem, search(problem))
+            self.assertAlmostEqual(path_cost(problem, path), expected)
+            self.assertAlmostEqual(stats.path_cost, expected)
+            self.assertGreater(stats.generated, stats.expansions)
+
+        row, col = problem.row_col(problem.goal())
+        problem.cell_costs[row - 1:row + 2, col - 1:col + 2] = np.inf
+        problem.cell_costs[row, col] = 0.0
+        self.assertIsNone(book_search.array_astar_search(problem))
+
+    def test_state_ids(self):
+        problem = book_search.ArrayGridProblem(20000, 3, (0, 0), (.5, .9))
+        self.assertEqual(problem.row_col(problem.goal()), (1, 18000))
+        self.assertNotEqual(problem.state_id(1, 0), problem.state_id(0, 10000))
+        self.assertNotEqual(hash(book_search.GridState(1, 0, 0)),
+                            hash(book_search.GridState(0, 10000, 0)))
+
+    def test_expand(self):
+        problem = self.problem
+        state = problem.state_id(15, 19)
+        expected = sorted((s, problem.cost(state, s))
+                          for s in problem.successors(state))
+        self.assertEqual(sorted(problem.expand(state)), expected)
+        corner = problem.state_id(0, 0)
+        for next_state in problem.successors(corner):
+            row, col = problem.row_col(next_state)
+            self.assertTrue(0 <= row < problem.grid_height and
+                            0 <= col < problem.grid_width)
+
+
+class TestLPAStar(unittest.TestCase):
+
+    def setUp(self):
+        self.problem = random_grid_problem(40, .2, seed=4)
+
+    def check_optimal(self, planner):
+        path = planner.plan()
+        expected = book_search.astar_search(self.problem)
+        self.assertAlmostEqual(planner.path_cost(),
+                               path_cost(self.problem, expected))
+        self.assertAlmostEqual(path_cost(self.problem, path),
+                               path_cost(self.problem, expected))
+        return path
+
+    def test_replanning(self):
+        planner = incremental_search.LPAStar(self.problem)
+        path = self.check_optimal(planner)
+        full = planner.expansions
+
+        # Block part of the current path.
+        changed = path[len(path) // 2:len(path) // 2 + 2]
+        for state in changed:
+            state.cost = float('inf')
+        planner.cells_changed(changed)
+        self.check_optimal(planner)
+        self.assertLess(planner.expansions, full)
+        self.assertEqual(planner.full_search_expansions() > 0, True)
+
+        # Make some cells expensive, then clear the obstacles again.
+        expensive = [self.problem.grid[row][20] for row in range(5, 35)
+                     if self.problem.grid[row][20].cost == 0.0]
+        for state in expensive:
+            state.cost = 2.0
+        planner.cells_changed(expensive)
+        self.check_optimal(planner)
+        for state in changed:
+            state.cost = 0.0
+        planner.cells_changed(changed)
+        self.check_optimal(planner)
+
+
+class TestJumpPointSearch(unittest.TestCase):
+
+    def test_optimal_cost(self):
+        for seed in range(10):
+            for density in [0.0, .1, .3]:
+                problem = random_grid_problem(30, density, seed=seed)
+                expected = book_search.astar_search(problem)
+                path = jump_point_search.jps_search(problem)
+                if expected is None:
+                    self.assertIsNone(path)
+                    continue
+                self.assertAlmostEqual(path_cost(problem, path),
+                                       path_cost(problem, expected))
+                self.assertEqual(path[0], problem.start())
+                self.assertEqual(path[-1], problem.goal())
+                for state, next_state in zip(path, path[1:]):
+                    self.assertIn(next_state, problem.successors(state))
+
+    def test_fallback(self):
+        problem = random_grid_problem(30, .1, seed=5)
+        self.assertTrue(jump_point_search.is_uniform(problem))
+        for row in range(30):
+            if problem.grid[row][15].cost == 0.0:
+                problem.grid[row][15].cost = 2.0
+        self.assertFalse(jump_point_search.is_uniform(problem))
+        expected = book_search.astar_search(problem)
+        path = jump_point_search.jps_search(problem)
+        self.assertAlmostEqual(path_cost(problem, path),
+                               path_cost(problem, expected))
+
+
+class TestBidirectionalSearch(unittest.TestCase):
+
+    def test_optimal_cost(self):
+        pairs = [(book_search.dijkstra_search,
+                  bidirectional_search.bidirectional_dijkstra_search),
+                 (book_search.astar_search,
+                  bidirectional_search.bidirectional_astar_search)]
+        for seed in range(8):
+            problem = random_grid_problem(30, .3, seed=seed)
+            for row in range(5, 25):
+                if problem.grid[row][12].cost == 0.0:
+                    problem.grid[row][12].cost = 2.0
+            for search, bidirectional in pairs:
+                expected = search(problem)
+                path = bidirectional(problem)
+                if expected is None:
+                    self.assertIsNone(path)
+                    continue
+                self.assertAlmostEqual(path_cost(problem, path),
+                                       path_cost(problem, expected))
+                self.assertEqual(path[0], problem.start())
+                self.assertEqual(path[-1], problem.goal())
+                for state, next_state in zip(path, path[1:]):
+                    self.assertIn(next_state, problem.successors(state))
+
+
+class TestLandmarks(unittest.TestCase):
+
+    def test_alt_queries(self):
+        problem = random_grid_problem(30, .3, seed=6)
+        for row in range(5, 25):
+            if problem.grid[row][12].cost == 0.0:
+                problem.grid[row][12].cost = 2.0
+        tables = landmarks.LandmarkTables.build(problem, 4)
+        tmp_dir = tempfile.mkdtemp()
+        file_name = os.path.join(tmp_dir, 'tables.npz')
+        tables.save(file_name)
+        loaded = landmarks.LandmarkTables.load(file_name)
+        os.remove(file_name)
+        os.rmdir(tmp_dir)
+        self.assertTrue((loaded.from_landmarks == tables.from_landmarks).all())
+        self.assertEqual(loaded.from_landmarks.dtype, np.float32)
+
+        rng = random.Random(0)
+        free = [state for row in problem.grid for state in row
+                if state.cost != float('inf')]
+        for _ in range(20):
+            start, goal = rng.sample(free, 2)
+            alt_problem = landmarks.ALTProblem(problem, loaded, start, goal)
+            path = book_search.astar_search(alt_problem)
+            expected = book_search.dijkstra_search(alt_problem)
+            if expected is None:
+                self.assertIsNone(path)
+            else:
+                self.assertAlmostEqual(path_cost(problem, path),
+                                       path_cost(problem, expected))
+
+
+class TestHPAStar(unittest.TestCase):
+
+    def check_queries(self, problem, planner, rng):
+        free = [state for row in problem.grid for state in row
+                if state.cost != float('inf')]
+        for _ in range(10):
+            start, goal = rng.sample(free, 2)
+            path = planner.plan(start, goal)
+            query = book_search.QueryProblem(problem, start, goal)
+            expected = book_search.astar_search(query)
+            if expected is None:
+                self.assertIsNone(path)
+                continue
+            self.assertEqual(path[0], start)
+            self.assertEqual(path[-1], goal)
+            for state, next_state in zip(path, path[1:]):
+                self.assertIn(next_state, problem.successors(state))
+            self.assertGreaterEqual(path_cost(problem, path) + 1e-9,
+                                    path_cost(problem, expected))
+
+    def test_queries_and_updates(self):
+        rng = random.Random(1)
+        problem = random_grid_problem(45, .2, seed=8)
+        planner = hierarchical_search.HPAStar(problem, cluster_size=10)
+        self.check_queries(problem, planner, rng)
+
+        changed = [problem.grid[row][22] for row in range(45)]
+        for state in changed:
+            state.cost = float('inf')
+        planner.cells_changed(changed)
+        fresh = hierarchical_search.HPAStar(problem, cluster_size=10)
+        self.assertEqual(planner.transitions, fresh.transitions)
+        self.check_queries(problem, planner, rng)
+
+
+class TestCostToGoField(unittest.TestCase):
+
+    def test_field_paths(self):
+        problem = random_grid_problem(30, .25, seed=9)
+        for row in range(5, 25):
+            if problem.grid[row][14].cost == 0.0:
+                problem.grid[row][14].cost = 2.0
+        goals = [problem.goal(), problem.grid[2][27], problem.grid[27][3]]
+        goals = [goal for goal in goals if goal.cost != float('inf')]
+        field = problem.cost_to_go(goals)
+        single_fields = [problem.cost_to_go([goal]) for goal in goals]
+        self.assertEqual(field.grid().shape, (30, 30))
+
+        rng = random.Random(2)
+        free = [state for row in problem.grid for state in row
+                if state.cost != float('inf')]
+        for start in rng.sample(free, 20):
+            path = field.path(start)
+            expected = min(f.cost(start) for f in single_fields)
+            if expected == float('inf'):
+                self.assertIsNone(path)
+                continue
+            self.assertEqual(path[0], start)
+            self.assertIn(path[-1], goals)
+            self.assertAlmostEqual(path_cost(problem, path), expected)
+
+        expected = book_search.astar_search(
+            book_search.QueryProblem(problem, free[0]))
+        single = problem.cost_to_go()
+        if expected is not None:
+            self.assertAlmostEqual(single.cost(free[0]),
+                                   path_cost(problem, expected))
+
+
+class TestMultiGoalProblem(unittest.TestCase):
+
+    def check_nearest(self, problem, goals, search, goal_test=None):
+        dist = book_search.distance_array(problem, [problem.start()])
+        expected = min(dist[problem.state_index(goal)] for goal in goals
+                       if goal_test is None or goal_test(goal))
+        multi = book_search.MultiGoalProblem(problem, goals, goal_test)
+        path = search(multi)
+        self.assertEqual(path[0], problem.start())
+        self.assertIn(path[-1], goals)
+        self.assertAlmostEqual(path_cost(problem, path), expected)
+        return path
+
+    def test_nearest_goal(self):
+        problem = random_grid_problem(40, .25, seed=5)
+        rng = random.Random(6)
+        free = [state for row in problem.grid for state in row
+                if state.cost != float('inf')]
+        goals = rng.sample(free, 10)
+        for search in [book_search.astar_search,
+                       book_search.dijkstra_search]:
+            nearest = self.check_nearest(problem, goals, search)[-1]
+        self.check_nearest(problem, goals, book_search.astar_search,
+                           lambda state: state != nearest)
+
+        multi = book_search.MultiGoalProblem(
+            problem, goal_test=lambda state: state in goals[:3])
+        self.assertEqual(multi.heuristic(problem.start()), 0.0)
+        self.assertIn(book_search.astar_search(multi)[-1], goals[:3])
+        self.assertRaises(ValueError, book_search.MultiGoalProblem, problem)
+        self.assertRaises(ValueError, book_search.MultiGoalProblem, problem,
+                          [])
+
+    def test_array_problem(self):
+        problem = random_grid_problem(
+            40, .25, seed=5, problem_class=book_search.ArrayGridProblem)
+        rng = random.Random(6)
+        free = [state for state in range(problem.num_indices())
+                if problem.cell_cost(state) != float('inf')]
+        goals = rng.sample(free, 10)
+        multi = book_search.MultiGoalProblem(problem, goals)
+        heuristics = multi.heuristic_array()
+        for state in free[:50]:
+            self.assertAlmostEqual(heuristics[state], multi.heuristic(state))
+        for search in [book_search.astar_search,
+                       book_search.array_astar_search,
+                       book_search.array_dijkstra_search]:
+            self.check_nearest(problem, goals, search)
+
+
+class TestDeltaStepping(unittest.TestCase):
+
+    def test_matches_dijkstra(self):
+        problem = random_grid_problem(
+            40, .3, seed=7, problem_class=book_search.ArrayGridProblem)
+        problem.cell_costs[5:35, 12] = 3.0
+        expected = book_search.distance_array(problem, [problem.start()])
+        reached = np.isfinite(expected)
+        self.assertFalse(reached.all())
+        parents = []
+        for delta, num_workers in [(2.0, 1), (2.0, 3), (50.0, 2)]:
+            planner = parallel_search.DeltaStepping(problem, delta,
+                                                    num_workers)
+            dist, parent = planner.search()
+            np.testing.assert_array_equal(np.isfinite(dist), reached)
+            np.testing.assert_allclose(dist[reached], expected[reached])
+            self.assertTrue((parent[~reached] == -1).all())
+            parents.append(parent)
+
+            path = planner.path(problem.goal())
+            self.assertEqual(path[0], problem.start())
+            self.assertAlmostEqual(path_cost(problem, path),
+                                   dist[problem.goal()])
+            unreachable = int(np.flatnonzero(~reached)[0])
+            self.assertIsNone(planner.path(unreachable))
+        # Rounds are synchronous, so the split into bands does not matter.
+        np.testing.assert_array_equal(parents[0], parents[1])
+
+
+if __name__ == '__main__':
+    unittest.main()